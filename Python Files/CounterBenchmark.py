@@ -0,0 +1,83 @@
+import pandas as pd
+import os
+import sys
+import tempfile
+import time
+from TraceReader import count_trace
+from FeatureCount import build_sensor_counts
+from TraceGenerator import write_trace
+
+# Size of the synthetic trace used for the benchmark
+row_count = 2000000
+sensor_count = 100
+malicious_count = 3
+
+
+# Function to count the messages the way FeatureCount.py did before the shared counter engine
+def count_messages_baseline(df, packet_type, control_packet_name):
+    control_packets = df[(df['PACKET_TYPE'] == packet_type) & (df['PACKET_STATUS'] == 'Successful')]
+    specific_packets = control_packets[control_packets['CONTROL_PACKET_TYPE/APP_NAME'] == control_packet_name]
+    sent_count = specific_packets[~specific_packets['SOURCE_ID'].str.contains('SINKNODE|ROUTER', case=False)]['SOURCE_ID'].str.replace('SENSOR-', 'S-').value_counts()
+    received_count = specific_packets[~specific_packets['RECEIVER_ID'].str.contains('SINKNODE|ROUTER', case=False)]['RECEIVER_ID'].str.replace('SENSOR-', 'S-').value_counts()
+    return pd.DataFrame({
+        f'{control_packet_name}_Sent': sent_count,
+        f'{control_packet_name}_Received': received_count
+    }).fillna(0).astype(int)
+
+
+# Function to build the Sensor_Message_Counts table with the baseline counters
+def sensor_counts_baseline(file_path):
+    df = pd.read_csv(file_path, encoding='latin1')
+    dao_counts = count_messages_baseline(df, 'Control_Packet', 'DAO')
+    dio_counts = count_messages_baseline(df, 'Control_Packet', 'DIO')
+    all_counts = pd.concat([dao_counts, dio_counts], axis=1).fillna(0).astype(int)
+    sensing_packets = df[(df['PACKET_TYPE'] == 'Sensing') & (df['PACKET_STATUS'] == 'Successful')].copy()
+    sensing_packets['RECEIVER_ID'] = sensing_packets['RECEIVER_ID'].str.replace('SENSOR-', 'S-')
+    sensor_receive_counts = sensing_packets[sensing_packets['RECEIVER_ID'].str.contains('S-', na=False)]['RECEIVER_ID'].value_counts()
+    all_counts['Packet_Received'] = sensor_receive_counts.reindex(all_counts.index, fill_value=0).astype(int)
+    return all_counts.sort_index(axis=1).T
+
+
+# Function to time a call, returning its result and the elapsed seconds
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+# Main function to compare the baseline and the shared counter engine on the same trace
+def main(row_count, sensor_count):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'Packet Trace.csv')
+        print(f"Writing synthetic trace with {row_count} rows and {sensor_count} sensors...")
+        write_trace(file_path, row_count, sensor_count, malicious_count)
+
+        baseline_counts, baseline_time = timed(sensor_counts_baseline, file_path)
+        engine_counts, engine_time = timed(lambda: build_sensor_counts(count_trace(file_path, use_cache=False)))
+
+        # The CSV text written by both paths must be identical
+        if baseline_counts.to_csv() != engine_counts.to_csv():
+            print("Error: counter engine output differs from the baseline output.")
+            return 1
+
+        # Build the columnar cache, then time a run that reads from it
+        count_trace(file_path)
+        cached_counts, cached_time = timed(lambda: build_sensor_counts(count_trace(file_path)))
+        if baseline_counts.to_csv() != cached_counts.to_csv():
+            print("Error: counter engine output from the cache differs from the baseline output.")
+            return 1
+
+        print(f"Baseline (full read + boolean masks): {baseline_time:.2f} s")
+        print(f"Counter engine (chunked + bincount):  {engine_time:.2f} s, {baseline_time / engine_time:.2f}x")
+        print(f"Counter engine on the Parquet cache:  {cached_time:.2f} s, {baseline_time / cached_time:.2f}x")
+        print("Outputs identical")
+    return 0
+
+
+# Run the benchmark, optionally with the row and sensor counts given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        row_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        sensor_count = int(sys.argv[2])
+    sys.exit(main(row_count, sensor_count))
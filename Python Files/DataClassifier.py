@@ -1,66 +1,166 @@
 import pandas as pd
+import numpy as np
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.svm import SVC
 from sklearn.naive_bayes import GaussianNB
 from sklearn.linear_model import LogisticRegression
 from sklearn.neighbors import KNeighborsClassifier
+from DatasetIO import dataset_stem, read_dataset, resolve_dataset, save_dataset_files
+from FeatureStore import LABELS_EXTENSION, load_feature_matrix, write_feature_file
+from ModelStore import load_model, model_fingerprint, model_path, save_model
+from Profiler import profile_step
 
-# Function to train and test the classifier
-def run_classifier(classifier_name):
-    # Paths to training and test data
-    train_data_path = 'C:\\Users\\mihit\\Desktop\\Attack_detection_in_IoT\\Training-Samples\\training_data.xlsx'
-    test_data_path = "C:\\Users\\mihit\\Desktop\\Attack_detection_in_IoT\\Test-Samples\\test_data.xlsx"
+# Paths to training and test data, in whichever dataset format they were saved
+train_data_path = 'C:\\Users\\mihit\\Desktop\\Attack_detection_in_IoT\\Training-Samples\\training_data'
+test_data_path = "C:\\Users\\mihit\\Desktop\\Attack_detection_in_IoT\\Test-Samples\\test_data"
+
+# Also write the predictions as Excel files for reports
+export_xlsx = False
+
+# Folder the fitted models are saved to, a model is only retrained when its training data or parameters change
+models_path = os.path.join(os.getcwd(), 'Models')
+
+# Classifiers run by main() and how many of them are trained at the same time
+classifiers = ["SVM", "Naive Bayes", "Logistic Regression", "KNN"]
+workers = 4
+
+# Rows predicted per call, keeps the memory of large test sets bounded
+prediction_batch_size = 100000
+
+# Available classifiers: estimator class, its parameters and the file the predictions are saved to
+CLASSIFIERS = {
+    "SVM": (SVC, {'kernel': 'linear', 'random_state': 42}, 'SupportVectorMachine'),
+    "Naive Bayes": (GaussianNB, {}, 'NaiveBayes'),
+    "Logistic Regression": (LogisticRegression, {'random_state': 42, 'max_iter': 1000}, 'LogisticRegression'),
+    "KNN": (KNeighborsClassifier, {'n_neighbors': 5}, 'K-NearestNeighbour'),  # Adjust neighbors as needed
+    # KNN over a KD-tree index saved with the model, queried on all cores; for large training sets
+    "KNN Tree": (KNeighborsClassifier, {'n_neighbors': 5, 'algorithm': 'kd_tree', 'leaf_size': 40, 'n_jobs': -1},
+                 'K-NearestNeighbourTree'),
+}
+
+
+# Function to load the training and test data once, as read-only float32 matrices mapped from their feature
+# files and shared by all classifiers
+def load_data():
+    train_path = resolve_dataset(train_data_path)
+    test_path = resolve_dataset(test_data_path)
+    if train_path is None or test_path is None:
+        print("Training or test data not found!")
+        return None
+
+    # Map the training features and labels
+    train = load_feature_matrix(train_data_path)
+    if train['y'] is None:
+        print(f"Error: 'Label' column missing in training data {train_path}.")
+        return None
+
+    # Map the test features, and load the test data the predictions are saved with
+    test = load_feature_matrix(test_data_path)
+    test_df = read_dataset(test_path)
+
+    # Score the test features in the order the classifiers are trained on, not by column position
+    missing_features = [name for name in train['feature_names'] if name not in test['feature_names']]
+    if missing_features:
+        raise ValueError(f"Test data {test_path} is missing the features {missing_features} of the training data.")
+    X_test = test['X']
+    if test['feature_names'] != train['feature_names']:
+        X_test = X_test[:, [test['feature_names'].index(name) for name in train['feature_names']]]
+
+    return {'X_train': train['X'], 'y_train': train['y'], 'X_test': X_test, 'test_df': test_df,
+            'feature_names': train['feature_names']}
+
+
+# Function to predict the labels of large test sets in fixed-size batches
+def predict_in_batches(clf, X, batch_size=None):
+    batch_size = prediction_batch_size if batch_size is None else batch_size
+    if len(X) <= batch_size:
+        return clf.predict(X)
+    return np.concatenate([clf.predict(X[start:start + batch_size]) for start in range(0, len(X), batch_size)])
 
-    # Load the training data
-    train_df = pd.read_excel(train_data_path)
-    X_train = train_df.drop('Label', axis=1)
-    y_train = train_df['Label']
 
-    # Load the test data
-    test_df = pd.read_excel(test_data_path)
+# Function to add the predictions to the test data and save them
+def save_predictions(test_df, predictions, classifier_name, output_file=None):
+    # Add the predictions as a new column in a copy of the test data DataFrame
+    test_df = test_df.copy()
+    test_df['Label'] = predictions
+
+    # Save the updated DataFrame to a new file
+    output_file = CLASSIFIERS[classifier_name][2] if output_file is None else output_file
+    current_directory = os.getcwd()
+    output_file_paths = save_dataset_files(test_df, os.path.join(current_directory, output_file), export_xlsx)
+
+    # Also save the predicted labels alone, for the evaluation to map
+    write_feature_file(dataset_stem(output_file_paths[-1]) + LABELS_EXTENSION, np.zeros((len(predictions), 0)),
+                       predictions)
 
+    print(f"Predictions for {classifier_name} have been saved to {', '.join(output_file_paths)}")
+
+
+# Function to train and test the classifier
+def run_classifier(classifier_name, data=None):
     # Initialize the classifier
-    if classifier_name == "SVM":
-        clf = SVC(kernel='linear', random_state=42)
-        output_file = 'SupportVectorMachine.xlsx'
-    elif classifier_name == "Naive Bayes":
-        clf = GaussianNB()
-        output_file = 'NaiveBayes.xlsx'
-    elif classifier_name == "Logistic Regression":
-        clf = LogisticRegression(random_state=42, max_iter=1000)
-        output_file = 'LogisticRegression.xlsx'
-    elif classifier_name == "KNN":
-        clf = KNeighborsClassifier(n_neighbors=5)  # Adjust neighbors as needed
-        output_file = 'K-NearestNeighbour.xlsx'
-    else:
+    if classifier_name not in CLASSIFIERS:
         print("Invalid classifier selected!")
-        return
+        return None
+    estimator, params, output_file = CLASSIFIERS[classifier_name]
+
+    # Load the data unless it was loaded once for all classifiers
+    if data is None:
+        data = load_data()
+        if data is None:
+            return None
 
-    # Train the classifier
-    print(f"Training {classifier_name} classifier...")
-    clf.fit(X_train, y_train)
+    # Reuse the saved model if it was fitted on the same data with the same parameters
+    fingerprint = model_fingerprint(data['X_train'], data['y_train'], estimator, params)
+    saved_model_path = model_path(models_path, output_file)
+    artifact = load_model(saved_model_path)
+    if artifact is not None and artifact['fingerprint'] == fingerprint:
+        print(f"Using saved {classifier_name} classifier from {saved_model_path}")
+        clf = artifact['model']
+        fit_time = 0.0
+    else:
+        # Train the classifier
+        print(f"Training {classifier_name} classifier...")
+        clf = estimator(**params)
+        start = time.perf_counter()
+        with profile_step(f'fit {classifier_name}', rows=len(data['X_train'])):
+            clf.fit(data['X_train'], data['y_train'])
+        fit_time = time.perf_counter() - start
+        save_model(saved_model_path, clf, fingerprint, data['feature_names'])
 
     # Predict the labels for the test data
     print(f"Predicting with {classifier_name} classifier...")
-    predictions = clf.predict(test_df)
+    start = time.perf_counter()
+    with profile_step(f'predict {classifier_name}', rows=len(data['X_test'])):
+        predictions = predict_in_batches(clf, data['X_test'])
+    predict_time = time.perf_counter() - start
 
-    # Add the predictions as a new column in the test data DataFrame
-    test_df['Label'] = predictions
+    save_predictions(data['test_df'], predictions, classifier_name)
 
-    # Save the updated DataFrame to a new Excel file
-    current_directory = os.getcwd()
-    output_file_path = os.path.join(current_directory, output_file)
-    test_df.to_excel(output_file_path, index=False)
+    return {'Classifier': classifier_name, 'Fit (s)': fit_time, 'Predict (s)': predict_time}
+
+
+# Main function to run all classifiers, returning the timings of the ones that ran, None without data
+def main(classifier_names=None, max_workers=None):
+    classifier_names = classifiers if classifier_names is None else classifier_names
+    max_workers = workers if max_workers is None else max_workers
 
-    print(f"Predictions for {classifier_name} have been saved to {output_file_path}")
+    # Load the data once for all classifiers
+    data = load_data()
+    if data is None:
+        return None
 
+    # Fit and predict the classifiers in parallel, sharing the read-only arrays
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda classifier_name: run_classifier(classifier_name, data), classifier_names))
 
-# Main function to run all classifiers
-def main():
-    classifiers = ["SVM", "Naive Bayes", "Logistic Regression", "KNN"]
-    
-    for classifier_name in classifiers:
-        run_classifier(classifier_name)
+    # Report the time each classifier spent fitting and predicting
+    timings = pd.DataFrame([result for result in results if result is not None])
+    if not timings.empty:
+        print(timings.to_string(index=False, float_format='{:.3f}'.format))
+    return timings
 
 
 # Run the main function
@@ -0,0 +1,110 @@
+import pandas as pd
+import os
+from Profiler import profile_step
+
+# pyarrow is optional, without it datasets are stored as pandas pickles
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+
+# Binary format used for datasets and predictions, xlsx is only written when exported
+DATASET_EXTENSION = '.parquet' if pyarrow is not None else '.pkl'
+
+# Formats a dataset may be stored in, binary formats first
+DATASET_EXTENSIONS = ['.parquet', '.pkl', '.xlsx', '.csv']
+
+
+# Function to strip a known dataset extension from a path
+def dataset_stem(path):
+    stem, extension = os.path.splitext(path)
+    if extension.lower() in DATASET_EXTENSIONS:
+        return stem
+    return path
+
+
+# Function to get the path of a dataset in the given format
+def dataset_path(path, extension=DATASET_EXTENSION):
+    return dataset_stem(path) + extension
+
+
+# Function to find the stored copy of a dataset, whatever its format
+def resolve_dataset(path):
+    stem = dataset_stem(path)
+    candidates = [stem + extension for extension in DATASET_EXTENSIONS if os.path.exists(stem + extension)]
+    if not candidates:
+        return None
+    # The most recently written copy wins, e.g. an xlsx edited by hand after the export
+    return max(candidates, key=os.path.getmtime)
+
+
+# Function to load a dataset in any of the supported formats
+def read_dataset(path):
+    extension = os.path.splitext(path)[1].lower()
+    with profile_step(f'read {extension[1:]}') as step:
+        if extension == '.parquet':
+            df = pd.read_parquet(path)
+        elif extension == '.pkl':
+            df = pd.read_pickle(path)
+        elif extension == '.csv':
+            df = pd.read_csv(path)
+        else:
+            df = pd.read_excel(path)
+        step['rows'] = len(df)
+    return df
+
+
+# Function to get the column names of a dataset, reading only its header where the format allows
+def dataset_columns(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return pq.read_schema(path).names
+    if extension == '.csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+    return list(read_dataset(path).columns)
+
+
+# Function to load a dataset in chunks of rows, without holding all of it in memory where the format allows
+def read_dataset_chunks(path, chunksize, columns=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif extension == '.csv':
+        with pd.read_csv(path, chunksize=chunksize, usecols=columns) as reader:
+            yield from reader
+    else:
+        # Pickles and xlsx files can only be loaded whole
+        df = read_dataset(path)
+        if columns is not None:
+            df = df[columns]
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+
+
+# Function to save a dataset in the format given by the path's extension
+def write_dataset(df, path, index=False, sheet_name='Sheet1'):
+    extension = os.path.splitext(path)[1].lower()
+    with profile_step(f'write {extension[1:]}', rows=len(df)):
+        if extension == '.parquet':
+            df.to_parquet(path, index=index)
+        elif extension == '.pkl':
+            (df if index else df.reset_index(drop=True)).to_pickle(path)
+        elif extension == '.csv':
+            df.to_csv(path, index=index)
+        else:
+            with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+                df.to_excel(writer, index=index, sheet_name=sheet_name)
+    return path
+
+
+# Function to save a dataset in the binary format, and also as xlsx when exporting for reports
+def save_dataset_files(df, path, export_xlsx=False, index=False, sheet_name='Sheet1'):
+    saved_paths = []
+    # Write the xlsx first, so the binary copy is the most recent one and gets picked up
+    if export_xlsx:
+        saved_paths.append(write_dataset(df, dataset_path(path, '.xlsx'), index, sheet_name))
+    saved_paths.append(write_dataset(df, dataset_path(path), index))
+    return saved_paths
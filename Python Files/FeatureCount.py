@@ -1,78 +1,110 @@
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
+from Profiler import profile_step
+from TraceReader import count_trace, find_trace_file
 
 # Define the base path as the current working directory (where the script is located)
 base_path = "C:\\Users\\jace\\Documents\\Attack_detection_in_IoT\\Training-Samples"
 
-# Function to count sent and received messages for a given packet type
-def count_messages(df, packet_type, control_packet_name):
-    # Filter the packets by type and status
-    control_packets = df[(df['PACKET_TYPE'] == packet_type) & (df['PACKET_STATUS'] == 'Successful')]
+# Number of folders processed in parallel, 1 processes them one at a time
+workers = 1
 
-    # Filter for the specific control packet (DAO or DIO)
-    specific_packets = control_packets[control_packets['CONTROL_PACKET_TYPE/APP_NAME'] == control_packet_name]
+# Append the DODAG topology features of TopologyIndex.py to the message counts; models trained
+# without them need retraining
+topology_features = False
 
-    # Count messages sent by each sensor
-    sent_count = specific_packets[~specific_packets['SOURCE_ID'].str.contains('SINKNODE|ROUTER', case=False)]['SOURCE_ID'].str.replace('SENSOR-', 'S-').value_counts()
-
-    # Count messages received by each sensor
-    received_count = specific_packets[~specific_packets['RECEIVER_ID'].str.contains('SINKNODE|ROUTER', case=False)]['RECEIVER_ID'].str.replace('SENSOR-', 'S-').value_counts()
-
-    # Combine the counts into a DataFrame
-    combined_counts = pd.DataFrame({
-        f'{control_packet_name}_Sent': sent_count,
-        f'{control_packet_name}_Received': received_count
+# Function to combine the counters of a trace into the per-sensor message counts
+def build_sensor_counts(trace_counts):
+    # Combine the sent and received counts of DAO and DIO messages
+    dao_counts = pd.DataFrame({
+        'DAO_Sent': trace_counts['DAO_Sent'],
+        'DAO_Received': trace_counts['DAO_Received']
     }).fillna(0).astype(int)  # Fill NaNs with 0 and convert counts to integers
-
-    return combined_counts
-
-# Function to process first-level subdirectories and handle the 'Packet Trace.csv' files
-def process_directories(base_path):
-    # Loop through each item in the base directory
-    for folder_name in os.listdir(base_path):
-        folder_path = os.path.join(base_path, folder_name)
-
-        # Check if it's a directory
-        if os.path.isdir(folder_path):
-            # Construct the file path for 'Packet Trace.csv'
-            file_path = os.path.join(folder_path, 'Packet Trace.csv')
-
-            # Proceed if 'Packet Trace.csv' exists in the folder
-            if os.path.exists(file_path):
-                # Load the packet trace CSV file
-                df = pd.read_csv(file_path, encoding='latin1')
-
-                # Count DAO and DIO messages
-                dao_counts = count_messages(df, 'Control_Packet', 'DAO')
-                dio_counts = count_messages(df, 'Control_Packet', 'DIO')
-
-                # Combine the counts for DAO and DIO messages
-                all_counts = pd.concat([dao_counts, dio_counts], axis=1).fillna(0).astype(int)
-
-                # Filter for Sensing packets
-                sensing_packets = df[(df['PACKET_TYPE'] == 'Sensing') & (df['PACKET_STATUS'] == 'Successful')]
-
-                # Abbreviate sensor names for easier handling
-                sensing_packets['SOURCE_ID'] = sensing_packets['SOURCE_ID'].str.replace('SENSOR-', 'S-')
-                sensing_packets['RECEIVER_ID'] = sensing_packets['RECEIVER_ID'].str.replace('SENSOR-', 'S-')
-
-                # Count how many packets were received by each sensor
-                sensor_receive_counts = sensing_packets[sensing_packets['RECEIVER_ID'].str.contains('S-', na=False)]['RECEIVER_ID'].value_counts()
-
-                # Add received packet counts to the result
-                all_counts['Packet_Received'] = sensor_receive_counts.reindex(all_counts.index, fill_value=0).astype(int)
-
-                # Sort the DataFrame by sensor IDs
-                all_counts = all_counts.sort_index(axis=1)
-
-                # Transpose the DataFrame to match the desired format
-                all_counts = all_counts.T
-
-                # Output file path to save the results
-                output_file_path = os.path.join(folder_path, 'Sensor_Message_Counts.csv')
-
-                # Save the resulting DataFrame to a CSV file
-                all_counts.to_csv(output_file_path)
+    dio_counts = pd.DataFrame({
+        'DIO_Sent': trace_counts['DIO_Sent'],
+        'DIO_Received': trace_counts['DIO_Received']
+    }).fillna(0).astype(int)
+    all_counts = pd.concat([dao_counts, dio_counts], axis=1).fillna(0).astype(int)
+
+    # Add received packet counts to the result
+    all_counts['Packet_Received'] = trace_counts['Packet_Received'].reindex(all_counts.index, fill_value=0).astype(int)
+
+    # Sort the DataFrame by sensor IDs
+    all_counts = all_counts.sort_index(axis=1)
+
+    # Transpose the DataFrame to match the desired format
+    return all_counts.T
+
+# Function to count the messages of one experiment folder and save its Sensor_Message_Counts.csv
+def process_folder(folder_path, topology=False):
+    # Construct the file path for 'Packet Trace.csv'
+    file_path = find_trace_file(folder_path)
+
+    # Nothing to do if 'Packet Trace.csv' does not exist in the folder
+    if file_path is None:
+        return None
+
+    # Count DAO, DIO and Sensing messages in a single pass over the trace, collecting the DODAG edges
+    # in the same pass when the topology features are wanted
+    if topology:
+        from TopologyIndex import INTEGER_FEATURES, count_trace_topology
+        trace_counts, node_features = count_trace_topology(file_path)
+        all_counts = build_sensor_counts(trace_counts)
+        # One row per topology feature after the counters, for the sensors of the counts; the features are
+        # made objects before transposing so the counters and the integer features are still written as integers
+        node_features = node_features.reindex(all_counts.columns, fill_value=0)
+        node_features = node_features.astype({name: int for name in INTEGER_FEATURES}).astype(object).T
+        all_counts = pd.concat([all_counts.astype(object), node_features.astype(object)])
+    else:
+        trace_counts = count_trace(file_path)
+        all_counts = build_sensor_counts(trace_counts)
+
+    # Output file path to save the results
+    output_file_path = os.path.join(folder_path, 'Sensor_Message_Counts.csv')
+
+    # Save the resulting DataFrame to a CSV file
+    with profile_step('write counts', rows=all_counts.shape[1]):
+        all_counts.to_csv(output_file_path)
+    return output_file_path
+
+# Function to process first-level subdirectories and handle the 'Packet Trace.csv' files, or only the given ones
+def process_directories(base_path, workers=1, folder_names=None, topology=None):
+    topology = topology_features if topology is None else topology
+    # Collect the subdirectories of the base directory in a stable order
+    if folder_names is None:
+        folder_names = [folder_name for folder_name in sorted(os.listdir(base_path))
+                        if os.path.isdir(os.path.join(base_path, folder_name))]
+    folder_paths = [os.path.join(base_path, folder_name) for folder_name in folder_names]
+
+    # Map each folder to the output file it produced or the error it raised
+    results = {}
+    if workers > 1:
+        # Spread the folders across a pool of worker processes
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_folder, folder_path, topology) for folder_path in folder_paths]
+            # Collect results in folder order so the output does not depend on scheduling
+            for folder_name, future in zip(folder_names, futures):
+                try:
+                    results[folder_name] = future.result()
+                except Exception as e:
+                    results[folder_name] = e
+    else:
+        for folder_name, folder_path in zip(folder_names, folder_paths):
+            try:
+                results[folder_name] = process_folder(folder_path, topology)
+            except Exception as e:
+                results[folder_name] = e
+
+    # A failing folder does not stop the others, report all failures at the end
+    failures = {folder_name: error for folder_name, error in results.items() if isinstance(error, Exception)}
+    if failures:
+        print(f"Failed to process {len(failures)} of {len(results)} folders:")
+        for folder_name, error in failures.items():
+            print(f"  {folder_name}: {error}")
+
+    return results
 
 # Call the function to process the directories
-process_directories(base_path)
+if __name__ == "__main__":
+    process_directories(base_path, workers)
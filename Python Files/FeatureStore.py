@@ -0,0 +1,135 @@
+import numpy as np
+import json
+import os
+import struct
+from DatasetIO import dataset_stem, read_dataset, resolve_dataset
+from Profiler import profile_step
+
+# Extensions of the memory-mapped files: a feature matrix with its labels, or the labels alone
+FEATURES_EXTENSION = '.features'
+LABELS_EXTENSION = '.labels'
+
+# Marks the start of a feature file, followed by the length of its JSON schema header
+FEATURES_MAGIC = b'NSFM'
+FEATURES_VERSION = 1
+
+# Arrays start on a cache line, so the mapped matrix is aligned like a freshly allocated one
+ALIGNMENT = 64
+
+# Types the features and label codes are stored as
+FEATURE_DTYPE = np.float32
+LABEL_DTYPE = np.int8
+
+
+# Function to round an offset up to the next aligned one
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+# Function to write a feature matrix and label vector as contiguous arrays behind a schema header
+def write_feature_file(path, X, y=None, feature_names=()):
+    X = np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
+    classes = None
+    if y is not None:
+        # Labels are stored as int8 codes into the sorted classes
+        classes, codes = np.unique(np.asarray(y), return_inverse=True)
+        if len(classes) > np.iinfo(LABEL_DTYPE).max:
+            raise ValueError(f"Too many classes to store as {np.dtype(LABEL_DTYPE).name}: {len(classes)}")
+        codes = codes.astype(LABEL_DTYPE)
+
+    # The header is padded so the matrix starts aligned, the labels follow the matrix
+    header = {'version': FEATURES_VERSION, 'rows': X.shape[0], 'feature_names': list(feature_names),
+              'feature_dtype': np.dtype(FEATURE_DTYPE).name, 'label_dtype': np.dtype(LABEL_DTYPE).name,
+              'classes': None if classes is None else classes.tolist()}
+    header_bytes = json.dumps(header).encode()
+    header_bytes = header_bytes.ljust(aligned(len(FEATURES_MAGIC) + 4 + len(header_bytes)) - len(FEATURES_MAGIC) - 4)
+
+    # Write to a temporary file so a concurrent reader never maps a partial file
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with profile_step(f'write {os.path.splitext(path)[1][1:]}', rows=X.shape[0]):
+        with open(temp_path, 'wb') as file:
+            file.write(FEATURES_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            file.write(X.tobytes())
+            if classes is not None:
+                file.write(b'\0' * (aligned(X.nbytes) - X.nbytes))
+                file.write(codes.tobytes())
+        os.replace(temp_path, path)
+    return path
+
+
+# Function to read the schema header of a feature file
+def read_header(path):
+    with open(path, 'rb') as file:
+        if file.read(len(FEATURES_MAGIC)) != FEATURES_MAGIC:
+            raise ValueError(f"{path} is not a feature file")
+        header_length, = struct.unpack('<I', file.read(4))
+        header = json.loads(file.read(header_length))
+    if header['version'] != FEATURES_VERSION:
+        raise ValueError(f"{path} has feature file version {header['version']}, expected {FEATURES_VERSION}")
+
+    # The matrix starts right after the padded header, the labels at the next aligned offset after the matrix
+    header['x_offset'] = len(FEATURES_MAGIC) + 4 + header_length
+    matrix_bytes = header['rows'] * len(header['feature_names']) * np.dtype(header['feature_dtype']).itemsize
+    header['y_offset'] = header['x_offset'] + aligned(matrix_bytes)
+    return header
+
+
+# Function to map a feature file read-only: the matrix, the labels (None without) and the feature names
+def open_feature_file(path):
+    header = read_header(path)
+    rows, feature_names = header['rows'], header['feature_names']
+
+    # Map the arrays instead of reading them, every reader of the file shares the same pages
+    X = np.zeros((rows, 0), dtype=header['feature_dtype'])
+    if rows and feature_names:
+        X = np.memmap(path, dtype=header['feature_dtype'], mode='r', offset=header['x_offset'],
+                      shape=(rows, len(feature_names)))
+    y = None
+    if header['classes'] is not None:
+        y = np.memmap(path, dtype=header['label_dtype'], mode='r', offset=header['y_offset'], shape=(rows,)) \
+            if rows else np.zeros(0, dtype=header['label_dtype'])
+        classes = np.array(header['classes'])
+        # Codes are the labels themselves for 0/1 labels, anything else is decoded into a private array
+        if not np.array_equal(classes, np.arange(len(classes))):
+            y = classes[y]
+    return {'X': X, 'y': y, 'feature_names': feature_names, 'classes': header['classes']}
+
+
+# Function to check if a feature file was written after the dataset it was built from
+def is_fresh(feature_path, source_path):
+    return os.path.exists(feature_path) and os.path.getmtime(feature_path) >= os.path.getmtime(source_path)
+
+
+# Function to map the features and labels of a dataset, building its feature file on first use
+# or when the dataset changed, None if the dataset does not exist
+def load_feature_matrix(path, label_column='Label'):
+    source_path = resolve_dataset(path)
+    if source_path is None:
+        return None
+    feature_path = dataset_stem(path) + FEATURES_EXTENSION
+    if not is_fresh(feature_path, source_path):
+        # Every numeric column but the labels is a feature, names such as 'Sensor' are left out
+        df = read_dataset(source_path)
+        y = df[label_column].to_numpy() if label_column in df.columns else None
+        feature_df = df.drop(columns=[label_column], errors='ignore').select_dtypes('number')
+        write_feature_file(feature_path, feature_df.to_numpy(), y, feature_df.columns)
+    return open_feature_file(feature_path)
+
+
+# Function to map the labels of a dataset, from its labels or feature file when either is up to date,
+# None if the dataset does not exist or has no labels
+def load_label_vector(path, label_column='Label'):
+    source_path = resolve_dataset(path)
+    if source_path is None:
+        return None
+    for extension in (LABELS_EXTENSION, FEATURES_EXTENSION):
+        label_path = dataset_stem(path) + extension
+        if is_fresh(label_path, source_path):
+            return open_feature_file(label_path)['y']
+
+    df = read_dataset(source_path)
+    if label_column not in df.columns:
+        return None
+    label_path = write_feature_file(dataset_stem(path) + LABELS_EXTENSION, np.zeros((len(df), 0)),
+                                    df[label_column].to_numpy())
+    return open_feature_file(label_path)['y']
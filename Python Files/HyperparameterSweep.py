@@ -0,0 +1,180 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import sklearn
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler, StratifiedKFold
+from DataClassifier import CLASSIFIERS, predict_in_batches, train_data_path
+from DatasetIO import dataset_stem
+from FeatureStore import FEATURES_EXTENSION, load_feature_matrix, open_feature_file
+from Metrics import evaluate_classifiers
+
+# Folder the leaderboard and the cached fold results are written to
+sweep_path = os.path.join(os.getcwd(), 'Sweep')
+
+# Classifiers swept by main()
+sweep_classifiers = ["SVM", "Naive Bayes", "Logistic Regression", "KNN"]
+
+# 'grid' tries every combination of the search space, 'random' a sample of random_candidates of them
+search = 'grid'
+random_candidates = 10
+
+# Folds of the cross-validation, and the seed of the fold split and random search
+folds = 5
+seed = 42
+
+# Folds fitted at the same time, each in its own process
+workers = os.cpu_count() or 1
+
+# Values tried for each classifier, on top of its parameters in DataClassifier.CLASSIFIERS
+SEARCH_SPACES = {
+    "SVM": {'kernel': ['linear', 'rbf'], 'C': [0.1, 1.0, 10.0]},
+    "Naive Bayes": {'var_smoothing': [1e-9, 1e-7, 1e-5, 1e-3]},
+    "Logistic Regression": {'C': [0.01, 0.1, 1.0, 10.0], 'max_iter': [1000]},
+    "KNN": {'n_neighbors': [3, 5, 7, 11], 'weights': ['uniform', 'distance']},
+}
+
+# Name of the leaderboard file and of the folder of cached fold results
+LEADERBOARD_FILE_NAME = 'Sweep_Leaderboard.csv'
+CACHE_FOLDER_NAME = 'folds'
+
+
+# Function to list the candidate parameters of a classifier for the chosen search
+def candidate_params(classifier_name):
+    space = SEARCH_SPACES[classifier_name]
+    if search == 'random':
+        candidates = ParameterSampler(space, random_candidates, random_state=seed)
+    else:
+        candidates = ParameterGrid(space)
+    base_params = CLASSIFIERS[classifier_name][1]
+    return [dict(base_params, **params) for params in candidates]
+
+
+# Function to split the rows into the folds, stratified by label when every label has enough rows
+def fold_splits(y, folds, seed):
+    _, label_counts = np.unique(y, return_counts=True)
+    if label_counts.min() >= folds:
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    else:
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+# Function to get the key a fold result is cached under: the data, classifier, parameters and split
+def fold_key(data_fingerprint, classifier_name, params, fold):
+    key = [data_fingerprint, classifier_name, params, fold, folds, seed, sklearn.__version__]
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# Function to load a cached fold result, None if the fold has not run yet
+def load_fold_result(cache_path, key):
+    try:
+        with open(os.path.join(cache_path, key + '.json')) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+# Function to fit and score one candidate on one fold, in a worker process mapping the training features
+def run_fold(feature_path, classifier_name, params, fold, fold_count, split_seed, cache_path, key):
+    data = open_feature_file(feature_path)
+    X, y = data['X'], data['y']
+    train_index, test_index = fold_splits(y, fold_count, split_seed)[fold]
+
+    clf = CLASSIFIERS[classifier_name][0](**params)
+    start = time.perf_counter()
+    clf.fit(X[train_index], y[train_index])
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = predict_in_batches(clf, X[test_index])
+    predict_time = time.perf_counter() - start
+
+    metrics = evaluate_classifiers(y[test_index], {classifier_name: predictions})[0].iloc[0]
+    result = {'Classifier': classifier_name, 'Params': json.dumps(params, sort_keys=True), 'Fold': fold,
+              'Accuracy': float(metrics['Accuracy']), 'F1 Score': float(metrics['F1 Score']),
+              'Fit (s)': fit_time, 'Predict (us/row)': predict_time / len(test_index) * 1e6}
+
+    # Write to a temporary file so an interrupted sweep never leaves a partial result behind
+    temp_path = os.path.join(cache_path, f'{key}.{os.getpid()}.tmp')
+    with open(temp_path, 'w') as file:
+        json.dump(result, file)
+    os.replace(temp_path, os.path.join(cache_path, key + '.json'))
+    return result
+
+
+# Function to rank the candidates by their mean scores over the folds
+def build_leaderboard(results):
+    df = pd.DataFrame(results)
+    leaderboard = df.groupby(['Classifier', 'Params'], sort=False).agg(
+        **{'Accuracy': ('Accuracy', 'mean'), 'Accuracy Std': ('Accuracy', 'std'), 'F1 Score': ('F1 Score', 'mean'),
+           'F1 Std': ('F1 Score', 'std'), 'Fit (s)': ('Fit (s)', 'mean'),
+           'Predict (us/row)': ('Predict (us/row)', 'mean'), 'Folds': ('Fold', 'count')}).reset_index()
+    # Best detection first, the cheaper model first among equally good ones, ignoring float noise in the means
+    leaderboard = leaderboard.round({'Accuracy': 6, 'F1 Score': 6})
+    leaderboard = leaderboard.sort_values(['F1 Score', 'Accuracy', 'Predict (us/row)'], ascending=[False, False, True],
+                                          ignore_index=True)
+    leaderboard.insert(0, 'Rank', range(1, len(leaderboard) + 1))
+    return leaderboard
+
+
+# Main function to cross-validate every candidate of every classifier and save the leaderboard
+def main(classifier_names=None, max_workers=None):
+    classifier_names = sweep_classifiers if classifier_names is None else classifier_names
+    max_workers = workers if max_workers is None else max_workers
+
+    # Map the training data once here, the workers map the same feature file
+    data = load_feature_matrix(train_data_path)
+    if data is None or data['y'] is None:
+        print("Labelled training data not found!")
+        return None
+    feature_path = dataset_stem(train_data_path) + FEATURES_EXTENSION
+    with open(feature_path, 'rb') as file:
+        data_fingerprint = hashlib.sha256(file.read()).hexdigest()
+    cache_path = os.path.join(sweep_path, CACHE_FOLDER_NAME)
+    os.makedirs(cache_path, exist_ok=True)
+
+    # Reuse the folds that already ran, and run the others in parallel
+    results = []
+    tasks = []
+    for classifier_name in classifier_names:
+        if classifier_name not in SEARCH_SPACES:
+            print(f"No search space for {classifier_name}, skipping.")
+            continue
+        for params in candidate_params(classifier_name):
+            for fold in range(folds):
+                key = fold_key(data_fingerprint, classifier_name, params, fold)
+                result = load_fold_result(cache_path, key)
+                if result is not None:
+                    results.append(result)
+                else:
+                    tasks.append((feature_path, classifier_name, params, fold, folds, seed, cache_path, key))
+    print(f"Sweeping {len(results) + len(tasks)} folds, {len(results)} cached, {len(tasks)} to run...")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_fold, *task): task for task in tasks}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            _, classifier_name, params, fold = futures[future][:4]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error in fold {fold} of {classifier_name} {params}: {e}")
+                continue
+            print(f"[{done_count}/{len(tasks)}] {classifier_name} fold {fold}")
+
+    if not results:
+        return None
+
+    leaderboard = build_leaderboard(results)
+    leaderboard_path = os.path.join(sweep_path, LEADERBOARD_FILE_NAME)
+    leaderboard.to_csv(leaderboard_path, index=False)
+    print(leaderboard.to_string(index=False, float_format='{:.4f}'.format))
+    print(f"Leaderboard saved to {leaderboard_path}")
+    return leaderboard
+
+
+# Run the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import numpy as np
+import time
+from sklearn.naive_bayes import GaussianNB
+from sklearn.linear_model import SGDClassifier
+from DatasetIO import read_dataset, read_dataset_chunks, resolve_dataset
+from DataClassifier import models_path, predict_in_batches, save_predictions, test_data_path, train_data_path
+from ModelStore import chunked_fingerprint, load_model, model_path, save_model
+from Profiler import profile_step
+
+# Training rows held in memory at a time, bounds the memory used for training
+chunksize = 100000
+
+# Passes over the training data for the learners that improve with more than one
+epochs = 5
+
+# Continue training the saved models on the new training data instead of starting over
+warm_start = False
+
+# Incremental classifiers run by main()
+incremental_classifiers = ["Naive Bayes (incremental)", "Logistic Regression (incremental)", "SVM (incremental)"]
+
+# Classifiers that learn with partial_fit: estimator class, its parameters, the file the predictions
+# are saved to and whether it takes several passes over the data
+INCREMENTAL_CLASSIFIERS = {
+    "Naive Bayes (incremental)": (GaussianNB, {}, 'NaiveBayesIncremental', False),
+    "Logistic Regression (incremental)": (SGDClassifier, {'loss': 'log_loss', 'random_state': 42},
+                                          'LogisticRegressionIncremental', True),
+    "SVM (incremental)": (SGDClassifier, {'loss': 'hinge', 'random_state': 42}, 'SupportVectorMachineIncremental', True),
+}
+
+
+# Function to read the training data in (X, y) chunks of contiguous float arrays
+def training_chunks(train_path, chunksize):
+    for chunk in read_dataset_chunks(train_path, chunksize):
+        X_chunk = np.ascontiguousarray(chunk.drop('Label', axis=1).to_numpy(dtype=np.float64))
+        yield X_chunk, chunk['Label'].to_numpy()
+
+
+# Function to scan the training data once for its feature names, classes and fingerprint
+def scan_training_data(train_path, chunksize, estimator, params):
+    feature_names = None
+    classes = set()
+
+    # Function to read the chunks while collecting their feature names and classes
+    def chunks():
+        nonlocal feature_names
+        for chunk in read_dataset_chunks(train_path, chunksize):
+            feature_names = [column for column in chunk.columns if column != 'Label']
+            classes.update(chunk['Label'].unique().tolist())
+            yield chunk[feature_names].to_numpy(dtype=np.float64), chunk['Label'].to_numpy()
+
+    fingerprint = chunked_fingerprint(chunks(), estimator, params)
+    return feature_names, np.array(sorted(classes)), fingerprint
+
+
+# Function to train an incremental classifier chunk by chunk
+def train_incremental(classifier_name, train_path):
+    estimator, params, output_file, multi_pass = INCREMENTAL_CLASSIFIERS[classifier_name]
+    feature_names, classes, fingerprint = scan_training_data(train_path, chunksize, estimator, params)
+    saved_model_path = model_path(models_path, output_file)
+    artifact = load_model(saved_model_path)
+
+    if warm_start and artifact is not None:
+        # Keep training the saved model, unless it has already seen this training data
+        if fingerprint in artifact.get('batches', []):
+            print(f"Saved {classifier_name} classifier has already been trained on this data")
+            return artifact['model'], artifact['feature_names']
+        clf = artifact['model']
+        # A new batch may not contain every class, keep the ones the model was trained with
+        classes = clf.classes_
+        batches = artifact.get('batches', []) + [fingerprint]
+        saved_fingerprint = f"{artifact['fingerprint']}+{fingerprint}"
+        print(f"Continuing training of saved {classifier_name} classifier...")
+    elif artifact is not None and artifact['fingerprint'] == fingerprint:
+        print(f"Using saved {classifier_name} classifier from {saved_model_path}")
+        return artifact['model'], artifact['feature_names']
+    else:
+        clf = estimator(**params)
+        batches = [fingerprint]
+        saved_fingerprint = fingerprint
+        print(f"Training {classifier_name} classifier...")
+
+    # Stream the training data, shuffling each chunk so the order of the folders does not bias the learner
+    rng = np.random.default_rng(42)
+    for epoch in range(epochs if multi_pass else 1):
+        for X_chunk, y_chunk in training_chunks(train_path, chunksize):
+            order = rng.permutation(len(X_chunk))
+            with profile_step(f'fit {classifier_name}', rows=len(X_chunk)):
+                clf.partial_fit(X_chunk[order], y_chunk[order], classes=classes)
+
+    save_model(saved_model_path, clf, saved_fingerprint, feature_names, batches=batches)
+    return clf, feature_names
+
+
+# Main function to train the incremental classifiers and predict the test data
+def main(classifier_names=None):
+    classifier_names = incremental_classifiers if classifier_names is None else classifier_names
+
+    train_path = resolve_dataset(train_data_path)
+    test_path = resolve_dataset(test_data_path)
+    if train_path is None or test_path is None:
+        print("Training or test data not found!")
+        return
+    test_df = read_dataset(test_path)
+
+    for classifier_name in classifier_names:
+        if classifier_name not in INCREMENTAL_CLASSIFIERS:
+            print("Invalid classifier selected!")
+            continue
+
+        start = time.perf_counter()
+        clf, feature_names = train_incremental(classifier_name, train_path)
+        fit_time = time.perf_counter() - start
+
+        # Predict the labels for the test data
+        print(f"Predicting with {classifier_name} classifier...")
+        X_test = np.ascontiguousarray(test_df[feature_names].to_numpy(dtype=np.float64))
+        with profile_step(f'predict {classifier_name}', rows=len(X_test)):
+            predictions = predict_in_batches(clf, X_test)
+        save_predictions(test_df, predictions, classifier_name, INCREMENTAL_CLASSIFIERS[classifier_name][2])
+        print(f"{classifier_name} trained in {fit_time:.3f} s")
+
+
+# Run the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import numpy as np
+import os
+import sys
+import time
+from sklearn.neighbors import KNeighborsClassifier
+from DatasetIO import read_dataset, resolve_dataset
+from DataClassifier import CLASSIFIERS, predict_in_batches
+
+# Labelled data the synthetic training corpus is resampled from
+sample_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Sample_data_files', 'training_data')
+
+# Size of the synthetic training corpus and of the held-out query set
+train_rows = 1000000
+query_rows = 20000
+
+
+# Function to scale the labelled sample data up to the requested number of rows
+def resample_dataset(X, y, rows, seed=42):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(X), rows)
+    # Small jitter keeps the resampled rows distinct, rounded like the normalized features
+    X_resampled = np.clip(X[picks] + rng.normal(0, 0.02, (rows, X.shape[1])), 0, 1).round(2)
+    return np.ascontiguousarray(X_resampled), y[picks]
+
+
+# Function to fit a KNN classifier and time its fit and batched predictions
+def benchmark_knn(params, X_train, y_train, X_query):
+    clf = KNeighborsClassifier(**params)
+    start = time.perf_counter()
+    clf.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = predict_in_batches(clf, X_query)
+    return predictions, fit_time, time.perf_counter() - start
+
+
+# Main function to compare brute-force KNN with the tree-indexed KNN modes on a large corpus
+def main(train_rows, query_rows):
+    train_df = read_dataset(resolve_dataset(sample_data_path))
+    X = train_df.drop('Label', axis=1).to_numpy(dtype=np.float64)
+    y = train_df['Label'].to_numpy()
+
+    X_train, y_train = resample_dataset(X, y, train_rows, seed=1)
+    X_query, y_query = resample_dataset(X, y, query_rows, seed=2)
+    print(f"Training rows: {train_rows}, query rows: {query_rows}")
+
+    # The 'KNN' entry leaves the algorithm to sklearn, which picks a tree for low-dimensional data
+    modes = {
+        'Brute force': dict(CLASSIFIERS['KNN'][1], algorithm='brute'),
+        'KNN': CLASSIFIERS['KNN'][1],
+        'KNN Tree': CLASSIFIERS['KNN Tree'][1],
+        'Ball tree': dict(CLASSIFIERS['KNN Tree'][1], algorithm='ball_tree'),
+    }
+    results = {}
+    for mode, params in modes.items():
+        predictions, fit_time, predict_time = benchmark_knn(params, X_train, y_train, X_query)
+        results[mode] = predictions
+        accuracy = np.mean(predictions == y_query)
+        agreement = np.mean(predictions == results['Brute force'])
+        print(f"{mode:12s} fit {fit_time:7.2f} s  predict {predict_time:7.2f} s  "
+              f"accuracy {accuracy:.4f}  agreement with brute force {agreement:.4f}")
+
+
+# Run the benchmark, optionally with the training and query sizes given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        train_rows = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        query_rows = int(sys.argv[2])
+    main(train_rows, query_rows)
@@ -0,0 +1,102 @@
+import pandas as pd
+import numpy as np
+
+# Metrics reported for every classifier
+METRIC_NAMES = ['Accuracy', 'Precision', 'Recall', 'F1 Score']
+
+
+# Function to encode label arrays as integer codes into the sorted union of their classes
+def encode_labels(*label_arrays):
+    label_arrays = [np.asarray(labels) for labels in label_arrays]
+    classes = np.unique(np.concatenate(label_arrays))
+    return classes, [np.searchsorted(classes, labels) for labels in label_arrays]
+
+
+# Function to build the confusion matrices of several models, per group, with a single bincount
+def confusion_matrices(actual_codes, predicted_codes, n_classes, group_codes=None, n_groups=1):
+    # One row of predicted codes per model
+    predicted_codes = np.atleast_2d(predicted_codes)
+    n_models = predicted_codes.shape[0]
+    if group_codes is None:
+        group_codes = np.zeros(len(actual_codes), dtype=np.int64)
+
+    # Encode (model, group, actual, predicted) into one key per model and row
+    model_codes = np.arange(n_models)[:, None]
+    keys = ((model_codes * n_groups + group_codes) * n_classes + actual_codes) * n_classes + predicted_codes
+    counts = np.bincount(keys.ravel(), minlength=n_models * n_groups * n_classes * n_classes)
+
+    # Shape (models, groups, actual class, predicted class)
+    return counts.reshape(n_models, n_groups, n_classes, n_classes)
+
+
+# Function to divide, giving 0 where the denominator is 0 (as sklearn does with zero_division=0)
+def safe_divide(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                     where=denominator != 0)
+
+
+# Function to derive the metrics of confusion matrices of shape (..., classes, classes)
+def metrics_from_confusion(cm, positive=None):
+    true_positives = np.diagonal(cm, axis1=-2, axis2=-1)
+    predicted_counts = cm.sum(axis=-2)
+    actual_counts = cm.sum(axis=-1)
+
+    # Per-class precision, recall and F1
+    precision = safe_divide(true_positives, predicted_counts)
+    recall = safe_divide(true_positives, actual_counts)
+    f1 = safe_divide(2 * true_positives, predicted_counts + actual_counts)
+
+    metrics = {'Accuracy': safe_divide(true_positives.sum(axis=-1), cm.sum(axis=(-2, -1)))}
+    if positive is not None:
+        # Binary metrics of the positive class, like sklearn's default average='binary'
+        metrics.update({'Precision': precision[..., positive], 'Recall': recall[..., positive],
+                        'F1 Score': f1[..., positive]})
+    else:
+        # Macro averages over the classes that occur in the actual or predicted labels of each matrix, so a
+        # group or model is not averaged over classes only seen elsewhere
+        present = (predicted_counts + actual_counts) > 0
+        class_counts = present.sum(axis=-1)
+        metrics.update({name: safe_divide((values * present).sum(axis=-1), class_counts)
+                        for name, values in [('Precision', precision), ('Recall', recall), ('F1 Score', f1)]})
+    return metrics
+
+
+# Function to evaluate all classifiers against the actual labels, overall and per group; each model is encoded
+# against the actual labels and its own predictions, so its metrics do not depend on the other models
+def evaluate_classifiers(actual_labels, predicted_labels, groups=None, positive_label=1):
+    names = list(predicted_labels)
+    group_names, group_codes = (np.array(['All']), None) if groups is None else np.unique(np.asarray(groups), return_inverse=True)
+
+    overall, per_group, confusion, classes = [], [], {}, {}
+    for name in names:
+        model_classes, (actual_codes, predicted_codes) = encode_labels(actual_labels, predicted_labels[name])
+
+        # Binary metrics when the labels are {0, 1}, macro averages for more classes
+        positive = None
+        if len(model_classes) <= 2 and positive_label in model_classes:
+            positive = int(np.searchsorted(model_classes, positive_label))
+
+        cm = confusion_matrices(actual_codes, predicted_codes, len(model_classes), group_codes, len(group_names))[0]
+
+        # Overall matrix is the sum over the groups
+        confusion[name] = cm.sum(axis=0)
+        classes[name] = model_classes
+        overall.append(metrics_from_confusion(confusion[name], positive))
+        per_group.append(metrics_from_confusion(cm, positive))
+        per_group[-1]['Rows'] = cm.sum(axis=(-2, -1))
+
+    summary = pd.DataFrame({'Classifier': names, **{metric: [float(metrics[metric]) for metrics in overall]
+                                                   for metric in METRIC_NAMES}})
+
+    breakdown = None
+    if groups is not None:
+        breakdown = pd.DataFrame({
+            'Classifier': np.repeat(names, len(group_names)),
+            'Group': np.tile(group_names, len(names)),
+            'Rows': np.concatenate([metrics['Rows'] for metrics in per_group]),
+            **{metric: np.concatenate([metrics[metric] for metrics in per_group]) for metric in METRIC_NAMES}
+        })
+
+    return summary, breakdown, confusion, classes
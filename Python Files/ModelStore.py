@@ -0,0 +1,156 @@
+import numpy as np
+import hashlib
+import json
+import os
+
+# joblib and scikit-learn are imported when a model is saved or unpickled, scoring an exported model needs neither
+
+# Extension of the saved model artifacts
+MODEL_EXTENSION = '.joblib'
+
+# Extension of the numpy-only export of a saved model, next to it
+EXPORT_EXTENSION = '.npz'
+
+
+# Function to get the path a classifier's model is saved to
+def model_path(models_path, output_file):
+    return os.path.join(models_path, output_file + MODEL_EXTENSION)
+
+
+# Function to fingerprint the training data and hyperparameters a model is fitted with
+def model_fingerprint(X_train, y_train, estimator, params):
+    return chunked_fingerprint([(X_train, y_train)], estimator, params)
+
+
+# Function to fingerprint training data read in (X, y) chunks and the hyperparameters a model is fitted with
+def chunked_fingerprint(chunks, estimator, params):
+    digest = hashlib.sha256()
+    for X_chunk, y_chunk in chunks:
+        for array in (X_chunk, y_chunk):
+            array = np.ascontiguousarray(array)
+            digest.update(f'{array.dtype.str}{array.shape}'.encode())
+            digest.update(array.tobytes())
+    # A different estimator, parameter or sklearn version also needs a new fit
+    import sklearn
+    digest.update(json.dumps([estimator.__name__, params, sklearn.__version__], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+# Function to save a fitted model together with its fingerprint, feature names and any extra details
+def save_model(file_path, clf, fingerprint, feature_names, **extra):
+    import joblib
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    artifact = {'model': clf, 'fingerprint': fingerprint, 'feature_names': list(feature_names), **extra}
+
+    # Write to a temporary file so a concurrent reader never sees a partial model
+    temp_path = f'{file_path}.{os.getpid()}.tmp'
+    joblib.dump(artifact, temp_path)
+    os.replace(temp_path, file_path)
+    export_model(file_path, clf, feature_names)
+
+
+# Function to load a saved model artifact, None if there is no usable one
+def load_model(file_path):
+    if not os.path.exists(file_path):
+        return None
+    import joblib
+    try:
+        return joblib.load(file_path)
+    except Exception as e:
+        print(f"Error loading model {file_path}: {e}")
+        return None
+
+
+# Function to get the path of the numpy-only export of a saved model
+def export_path(file_path):
+    return os.path.splitext(file_path)[0] + EXPORT_EXTENSION
+
+
+# Function to get the arrays that score a fitted model with numpy alone, None for models without such a form
+def model_arrays(clf):
+    estimator = type(clf).__name__
+    # String labels are stored as a plain string array rather than objects
+    classes = np.asarray(clf.classes_.tolist()) if hasattr(clf, 'classes_') else None
+    if estimator == 'GaussianNB':
+        return {'kind': 'naive_bayes', 'classes': classes, 'theta': clf.theta_, 'var': clf.var_,
+                'class_prior': clf.class_prior_}
+    if estimator in ('LogisticRegression', 'SGDClassifier'):
+        return {'kind': 'linear', 'classes': classes, 'coef': clf.coef_, 'intercept': clf.intercept_}
+    # Binary SVMs only, several classes are voted one against one
+    if estimator == 'SVC' and clf.kernel in ('linear', 'rbf') and len(classes) == 2:
+        return {'kind': 'svm', 'classes': classes, 'kernel': clf.kernel, 'gamma': clf._gamma,
+                'support_vectors': clf.support_vectors_, 'dual_coef': clf.dual_coef_, 'intercept': clf.intercept_}
+    return None
+
+
+# Function to write the numpy-only export of a saved model, removing an outdated one when the model has none
+def export_model(file_path, clf, feature_names):
+    arrays = model_arrays(clf)
+    exported_path = export_path(file_path)
+    if arrays is None:
+        if os.path.exists(exported_path):
+            os.remove(exported_path)
+        return None
+
+    # Plain arrays only, so loading never unpickles anything
+    temp_path = f'{exported_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as file:
+        np.savez(file, feature_names=np.array(list(feature_names), dtype=str), **arrays)
+    os.replace(temp_path, exported_path)
+    return exported_path
+
+
+# Function to load the numpy-only export of a saved model, None if there is none or the model was saved after it
+def load_export(file_path):
+    exported_path = export_path(file_path)
+    if not os.path.exists(exported_path) or (os.path.exists(file_path) and
+                                             os.path.getmtime(exported_path) < os.path.getmtime(file_path)):
+        return None
+    with np.load(exported_path, allow_pickle=False) as arrays:
+        model = {name: arrays[name] for name in arrays.files}
+    return {'model': model, 'feature_names': model.pop('feature_names').tolist()}
+
+
+# Function to load a model for scoring: its export when up to date, else the saved model, exporting it for next time
+def load_scoring_model(file_path):
+    artifact = load_export(file_path)
+    if artifact is not None:
+        return artifact
+    artifact = load_model(file_path)
+    if artifact is not None:
+        export_model(file_path, artifact['model'], artifact['feature_names'])
+    return artifact
+
+
+# Function to predict with an exported model the way its scikit-learn estimator does
+def predict_exported(model, X):
+    kind, classes = str(model['kind']), model['classes']
+    if kind == 'naive_bayes':
+        # Joint log likelihood of every class, most likely class first on ties
+        joint_log_likelihood = np.stack([
+            np.log(model['class_prior'][i]) - 0.5 * np.sum(np.log(2.0 * np.pi * model['var'][i]))
+            - 0.5 * np.sum((X - model['theta'][i]) ** 2 / model['var'][i], axis=1)
+            for i in range(len(classes))], axis=1)
+        return classes[np.argmax(joint_log_likelihood, axis=1)]
+
+    if kind == 'linear':
+        scores = X @ model['coef'].T + model['intercept']
+        if scores.shape[1] == 1:
+            return classes[(scores[:, 0] > 0).astype(np.intp)]
+        return classes[np.argmax(scores, axis=1)]
+
+    # SVM: kernel of every row with the support vectors, the second class from a decision of 0 up as in libsvm
+    support_vectors = model['support_vectors']
+    kernel = X @ support_vectors.T
+    if str(model['kernel']) == 'rbf':
+        squared_distances = (X ** 2).sum(axis=1)[:, None] + (support_vectors ** 2).sum(axis=1)[None, :] - 2 * kernel
+        kernel = np.exp(-float(model['gamma']) * np.maximum(squared_distances, 0))
+    decision = kernel @ model['dual_coef'][0] + model['intercept'][0]
+    return classes[(decision >= 0).astype(np.intp)]
+
+
+# Function to predict with a model loaded by load_scoring_model
+def predict_scoring(artifact, X):
+    if isinstance(artifact['model'], dict):
+        return predict_exported(artifact['model'], X)
+    return artifact['model'].predict(X)
@@ -0,0 +1,65 @@
+import pandas as pd
+import numpy as np
+import threading
+
+# Kinds of nodes in a NetSim trace, a node's kind is stored as its position in this list
+NODE_KINDS = ['sensor', 'sink', 'router', 'other', 'missing']
+SENSOR, SINK, ROUTER, OTHER, MISSING = range(len(NODE_KINDS))
+
+# Code of a missing node ID
+MISSING_CODE = -1
+
+
+# Function to create a registry interning node IDs into integer codes, with the label and kind of every code
+def new_registry():
+    return {'codes': {}, 'labels': [], 'kinds': [], 'lock': threading.Lock()}
+
+
+# Registry shared by every trace read by this process, each node ID is classified once
+default_registry = new_registry()
+
+
+# Function to classify a node ID: its abbreviated label and its kind
+def classify_node(node_id):
+    # Abbreviate sensor names for easier handling
+    label = node_id.replace('SENSOR-', 'S-')
+    upper_id = node_id.upper()
+    if 'SINKNODE' in upper_id:
+        return label, SINK
+    if 'ROUTER' in upper_id:
+        return label, ROUTER
+    # Any ID containing 'S-' after abbreviating is a sensor, as in the original counters, e.g. IOT_SENSOR-1
+    if 'S-' in label:
+        return label, SENSOR
+    return label, OTHER
+
+
+# Function to map every row of a node ID column to its node code, MISSING_CODE for missing values;
+# only the unique IDs of the column are looked up
+def intern_nodes(registry, column):
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype('category')
+    codes = registry['codes']
+    lookup = []
+    with registry['lock']:
+        for node_id in column.cat.categories:
+            if node_id not in codes:
+                codes[node_id] = len(registry['labels'])
+                label, kind = classify_node(node_id)
+                registry['labels'].append(label)
+                registry['kinds'].append(kind)
+            lookup.append(codes[node_id])
+    # The trailing entry catches missing values (category code -1)
+    return np.array(lookup + [MISSING_CODE])[column.cat.codes.to_numpy()]
+
+
+# Function to get the kind of every node code, followed by the kind of missing nodes so that
+# indexing with MISSING_CODE works
+def node_kinds(registry):
+    return np.array(registry['kinds'] + [MISSING], dtype=np.int8)
+
+
+# Function to get the labels of node codes, only when writing results
+def node_labels(registry, codes):
+    labels = registry['labels']
+    return [labels[code] for code in codes]
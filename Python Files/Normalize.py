@@ -1,78 +1,267 @@
 import pandas as pd
+import numpy as np
+import hashlib
+import json
 import os
+from DatasetIO import save_dataset_files
+from Profiler import profile_step
 
 # Define the base path where the folders are located
 base_path = "C:\\Users\\jace\\Documents\\Attack_detection_in_IoT\\Test-Samples"  # Use the current directory where the script is placed
 
-# Define the paths for the output Excel files
-file_with_index = os.path.join(base_path, 'normalized.xlsx')
-file_no_index = os.path.join(base_path, 'training_data.xlsx')
+# Define the paths for the output files, the extension is set by the dataset format
+file_with_index = os.path.join(base_path, 'normalized')
+file_no_index = os.path.join(base_path, 'training_data')
 
-# Initialize a list to store normalized and transposed DataFrames
-all_transposed_dfs = []
+# Also write the outputs as Excel files for reports
+export_xlsx = False
 
-# Iterate over each immediate subfolder in the base path
-for subfolder in os.listdir(base_path):
-    subfolder_path = os.path.join(base_path, subfolder)
+# Only reprocess the subfolders whose 'Sensor_Message_Counts.csv' changed since the last run
+incremental = True
 
-    # Check if it's a directory (immediate subfolder)
-    if os.path.isdir(subfolder_path):
-        print(f"Processing subfolder: {subfolder}")
+# Normalize the per-window counts of WindowedFeatureCount.py instead, one row per sensor and window,
+# each window normalized on its own; always a full build
+windowed = False
+
+# Manifest of the processed subfolders and the normalized rows it refers to, kept in the base path
+MANIFEST_FILE_NAME = 'normalize_manifest.json'
+ROWS_FILE_NAME = 'normalized_rows.pkl'
+
+# Bump when the normalization changes, so existing manifests are rebuilt
+MANIFEST_VERSION = 1
+
+
+# Function to normalize stacked blocks of message counts in place, one block of sensor rows per subfolder:
+# every feature is divided by its maximum over the block's sensors, 0 where that maximum is 0 or missing,
+# and rounded to two decimal places
+def normalize_blocks(values, block_starts, skipped_blocks=()):
+    # Maximum of every feature in every block, then the maximum each row is divided by
+    block_sizes = np.diff(np.append(block_starts, len(values)))
+    maxima = np.fmax.reduceat(values, block_starts, axis=0)
+    # Blocks that are normalized already are divided by 1
+    maxima[list(skipped_blocks)] = 1.0
+    row_maxima = np.repeat(maxima, block_sizes, axis=0)
+
+    # Safe division, missing counts and features without a maximum become 0
+    divisible = (row_maxima != 0) & ~np.isnan(row_maxima)
+    np.divide(values, row_maxima, out=values, where=divisible)
+    values[~divisible] = 0.0
+    np.copyto(values, 0.0, where=np.isnan(values))
+    return np.round(values, 2, out=values)
+
+
+# Function to read the message counts of one subfolder as its feature names, sensor IDs and a
+# (sensors x features) array of counts
+def read_message_counts(file_path):
+    # Load the CSV file into a DataFrame, using the first column as the index
+    df = pd.read_csv(file_path, index_col=0)
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        df = df.apply(pd.to_numeric, errors='coerce')  # Convert to numeric
+    return list(df.index), list(df.columns), df.to_numpy(dtype=np.float64).T
+
+
+# Function to normalize a table of message counts (one row per feature, one column per sensor)
+def normalize_message_counts(df):
+    numeric_df = df.apply(pd.to_numeric, errors='coerce')
+    values = normalize_blocks(numeric_df.to_numpy(dtype=np.float64).T.copy(), [0])
+    return pd.DataFrame(values, index=numeric_df.columns, columns=numeric_df.index, copy=False)
+
+
+# Function to hash the contents of an input file
+def file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+# Function to load the manifest and normalized rows of the previous run
+def load_manifest(base_path):
+    manifest_file = os.path.join(base_path, MANIFEST_FILE_NAME)
+    rows_file = os.path.join(base_path, ROWS_FILE_NAME)
+    try:
+        with open(manifest_file) as file:
+            manifest = json.load(file)
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}, None
+        return manifest['folders'], pd.read_pickle(rows_file)
+    except Exception:
+        # Missing or unreadable manifest, fall back to a full build
+        return {}, None
+
+
+# Function to save the manifest and normalized rows of this run
+def save_manifest(base_path, folders, final_transposed_df):
+    final_transposed_df.to_pickle(os.path.join(base_path, ROWS_FILE_NAME))
+    with open(os.path.join(base_path, MANIFEST_FILE_NAME), 'w') as file:
+        json.dump({'version': MANIFEST_VERSION, 'folders': folders}, file, indent=2)
+
+
+# Function to normalize every subfolder into one array, reusing the rows of unchanged ones when incremental;
+# returns the array, its feature names, sensor IDs and subfolder of every row, and the processed subfolders
+def build_dataset(base_path, incremental=True):
+    previous_folders, previous_rows = load_manifest(base_path) if incremental else ({}, None)
+
+    # Read the counts of every subfolder first, to allocate the array for all of them at once
+    blocks = []
+    feature_names = {}
+    reused_count = 0
+
+    # Iterate over each immediate subfolder in the base path
+    for subfolder in os.listdir(base_path):
+        subfolder_path = os.path.join(base_path, subfolder)
+
+        # Check if it's a directory (immediate subfolder)
+        if not os.path.isdir(subfolder_path):
+            continue
 
         # Define the file path for 'Sensor_Message_Counts.csv' in the subfolder
         file_path = os.path.join(subfolder_path, 'Sensor_Message_Counts.csv')
 
         # Check if the file exists in the subfolder
-        if os.path.exists(file_path):
+        if not os.path.exists(file_path):
+            print(f"File {file_path} does not exist. Skipping...")
+            continue
+
+        input_hash = file_hash(file_path)
+        previous = previous_folders.get(subfolder)
+        if previous_rows is not None and previous is not None and previous['hash'] == input_hash:
+            # Unchanged input, splice in the rows normalized by the previous run
+            start, stop = previous['rows']
+            # Features the subfolder does not have are all missing, leave them out as in a fresh read
+            rows = previous_rows.iloc[start:stop].drop(columns='Sensor').dropna(axis=1, how='all')
+            block = (subfolder, input_hash, list(rows.columns), list(rows.index), rows.to_numpy(dtype=np.float64), True)
+            reused_count += 1
+        else:
+            print(f"Processing subfolder: {subfolder}")
             try:
-                # Load the CSV file into a DataFrame, using the first column as the index
-                df = pd.read_csv(file_path, index_col=0)
+                block = (subfolder, input_hash, *read_message_counts(file_path), False)
+            except Exception as e:
+                print(f"Error processing file {file_path}: {e}")
+                continue
+        if not block[3]:
+            # Without sensors the subfolder adds no rows
+            continue
 
-                # Normalize the DataFrame by dividing each row by its maximum value
-                numeric_df = df.apply(pd.to_numeric, errors='coerce')  # Convert to numeric
-                max_values = numeric_df.max(axis=1)  # Get max value for each row
-                normalized_df = numeric_df.div(max_values, axis=0)  # Normalize rows
+        blocks.append(block)
+        feature_names.update(dict.fromkeys(block[2]))
 
-                # Handle any rows where max value is 0 or all values are NaN
-                normalized_df.fillna(0, inplace=True)
+    folders = {}
+    if incremental:
+        removed_count = len(set(previous_folders) - {block[0] for block in blocks})
+        print(f"Reused {reused_count} unchanged subfolders, processed {len(blocks) - reused_count}, removed {removed_count}")
 
-                # Round normalized values to two decimal places
-                normalized_df = normalized_df.round(2)
+    if not blocks:
+        return None, folders
 
-                # Transpose the DataFrame
-                transposed_df = normalized_df.T
+    # Copy every block into one array, in the column order the features first appear in
+    feature_names = list(feature_names)
+    feature_positions = {name: position for position, name in enumerate(feature_names)}
+    values = np.full((sum(len(block[3]) for block in blocks), len(feature_names)), np.nan)
+    block_starts, sensor_ids, sensor_folders, missing_features = [], [], [], []
+    row_count = 0
+    for subfolder, input_hash, block_features, block_sensors, block_values, reused in blocks:
+        rows = slice(row_count, row_count + len(block_sensors))
+        columns = [feature_positions[name] for name in block_features]
+        values[rows, columns] = block_values
+        if len(columns) < len(feature_names):
+            missing_features.append((rows, sorted(set(range(len(feature_names))) - set(columns))))
 
-                # Add a 'Sensor' column with the subfolder name (sensor name) repeated for all rows
-                transposed_df.insert(0, 'Sensor', subfolder)
+        block_starts.append(row_count)
+        sensor_ids.extend(block_sensors)
+        sensor_folders.extend([subfolder] * len(block_sensors))
+        folders[subfolder] = {'hash': input_hash, 'rows': [rows.start, rows.stop]}
+        row_count = rows.stop
 
-                # Append the transposed DataFrame to the list
-                all_transposed_dfs.append(transposed_df)
-            except Exception as e:
-                print(f"Error processing file {file_path}: {e}")
+    # Normalize all subfolders in one pass
+    with profile_step('normalize', rows=row_count):
+        normalize_blocks(values, block_starts, [index for index, block in enumerate(blocks) if block[5]])
+
+    # Features a subfolder does not have stay missing
+    for rows, columns in missing_features:
+        values[rows, columns] = np.nan
+
+    return (values, feature_names, sensor_ids, {'Sensor': sensor_folders}), folders
+
+
+# Function to normalize the per-window counts of every subfolder into one array, each window of a
+# subfolder being a block; returns the array, its feature names, sensor IDs and the subfolder and window
+# of every row
+def build_window_dataset(base_path):
+    # Only the windowed mode needs the trace reader behind the window counts
+    from WindowedFeatureCount import WINDOW_COLUMNS, WINDOW_COUNTS_FILE_NAME
+    window_dfs = []
+    for subfolder in os.listdir(base_path):
+        file_path = os.path.join(base_path, subfolder, WINDOW_COUNTS_FILE_NAME)
+        if not os.path.exists(file_path):
+            continue
+        try:
+            window_df = pd.read_csv(file_path)
+        except Exception as e:
+            print(f"Error processing file {file_path}: {e}")
+            continue
+        window_df.insert(0, 'Sensor', subfolder)
+        window_dfs.append(window_df)
+
+    if not window_dfs:
+        return None
+    window_df = pd.concat(window_dfs, ignore_index=True)
+    row_column_names = ['Sensor'] + WINDOW_COLUMNS
+    feature_names = [column for column in window_df.columns if column not in row_column_names + ['Sensor_ID']]
+    values = window_df[feature_names].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+
+    # The rows of a window are written together, a new block starts wherever the subfolder or window changes
+    row_keys = window_df[['Sensor', 'Window']]
+    block_starts = np.flatnonzero(row_keys.ne(row_keys.shift()).any(axis=1).to_numpy())
+    with profile_step('normalize', rows=len(values)):
+        normalize_blocks(values, block_starts)
+
+    row_columns = {column: window_df[column].to_numpy() for column in row_column_names}
+    return values, feature_names, window_df['Sensor_ID'].astype(str).tolist(), row_columns
+
+
+# Function to save the normalized dataset with and without its row labels, both as views of the same array
+def save_dataset(dataset, file_with_index, file_no_index, export_xlsx=False):
+    values, feature_names, sensor_ids, row_columns = dataset
+    dataset_df = pd.DataFrame(values, columns=feature_names, copy=False)
+
+    # Save the first file with index (retaining row labels like S-1, S-10, etc.), a 'Sensor' column
+    # with the subfolder name of every row and its window when windowed
+    indexed_df = dataset_df.set_axis(pd.Index(sensor_ids), axis=0)
+    for position, (column, column_values) in enumerate(row_columns.items()):
+        indexed_df.insert(position, column, column_values)
+    files_with_index = save_dataset_files(indexed_df, file_with_index, export_xlsx,
+                                          index=True, sheet_name='With_Index')
+
+    # Save the second file without index and without the 'Sensor' and window columns
+    files_no_index = save_dataset_files(dataset_df, file_no_index, export_xlsx,
+                                        index=False, sheet_name='No_Index')
+
+    print(f"File with index saved to: {', '.join(files_with_index)}")
+    print(f"File without index and with one column removed saved to: {', '.join(files_no_index)}")
+    return indexed_df
+
+
+# Main function to normalize the message counts of all subfolders
+def main():
+    if windowed:
+        dataset = build_window_dataset(base_path)
+        if dataset is None:
+            print(f"No window counts found. Please run WindowedFeatureCount.py on {base_path} first.")
         else:
-            print(f"File {file_path} does not exist. Skipping...")
+            save_dataset(dataset, file_with_index, file_no_index, export_xlsx)
+        return
 
-# Concatenate all normalized and transposed DataFrames
-if all_transposed_dfs:
-    final_transposed_df = pd.concat(all_transposed_dfs, axis=0)
+    dataset, folders = build_dataset(base_path, incremental)
 
-    # Save the first file with index (retaining row labels like S-1, S-10, etc.)
-    with pd.ExcelWriter(file_with_index, engine='xlsxwriter') as writer:
-        final_transposed_df.to_excel(writer, index=True, sheet_name='With_Index')
+    if dataset is None:
+        print("No data was processed. Please check the subfolders for valid CSV files.")
+        return
 
-    # Reset the index to remove row labels
-    final_transposed_df.reset_index(drop=True, inplace=True)
+    indexed_df = save_dataset(dataset, file_with_index, file_no_index, export_xlsx)
 
-    # Remove an additional column (e.g., 'Sensor' or another column)
-    column_to_remove = 'Sensor'  # Change this to the column you want to remove
-    if column_to_remove in final_transposed_df.columns:
-        final_transposed_df.drop(columns=[column_to_remove], inplace=True)
+    if incremental:
+        save_manifest(base_path, folders, indexed_df)
 
-    # Save the second file without index and with one column removed
-    with pd.ExcelWriter(file_no_index, engine='xlsxwriter') as writer:
-        final_transposed_df.to_excel(writer, index=False, sheet_name='No_Index')
 
-    print(f"File with index saved to: {file_with_index}")
-    print(f"File without index and with one column removed saved to: {file_no_index}")
-else:
-    print("No data was processed. Please check the subfolders for valid CSV files.")
+# Run the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import DataClassifier
+import Profiler
+from DatasetIO import dataset_columns, dataset_path, resolve_dataset
+from ModelStore import model_path
+from Profiler import profile_step
+from TraceReader import find_trace_file
+
+# Settings used when neither the config file nor the command line gives them
+DEFAULT_CONFIG = {
+    # Folders of NetSim runs, one subfolder with a 'Packet Trace.csv' per run
+    'training_samples': None,
+    'test_samples': None,
+    # Labelled training data and test data, default to the normalized data of the samples folders; the normalized
+    # training data has no 'Label' column, the classify stage is skipped until it is labelled
+    'train_data': None,
+    'test_data': None,
+    # Actual labels of the test data, the evaluate stage is skipped without them
+    'actual_data': None,
+    # Folder the models, predictions and metrics are written to
+    'output_path': os.getcwd(),
+    'classifiers': DataClassifier.classifiers,
+    # Folders or classifiers processed in parallel inside a stage, and stages run at the same time
+    'workers': 1,
+    'stage_workers': 3,
+    'export_xlsx': False,
+    'fast_plots': False,
+    # Append the DODAG topology features to the message counts, rerun with --force after changing it
+    'topology_features': False,
+    # Save a report of the time, memory and rows of every stage and step, and write cProfile stats of the stages
+    'profile': False,
+    'cprofile_path': None,
+}
+
+# File names the normalize stage writes to each samples folder: the data with and without sensor IDs
+NORMALIZED_NAMES = {'training_samples': ('normalized', 'training_data'), 'test_samples': ('normalized', 'test_data')}
+
+# Plot scripts run by the plot stages: script, plots folder in the test samples folder, plot file name and
+# the counters of which at least one is not 0 in a run the script draws a plot for
+PLOT_SCRIPTS = {
+    'plot_dao': ('DAO-Sent-Received.py', 'DAO_sent_rec_plots', '{}.png', ['DAO_Sent']),
+    'plot_dio': ('DIO-Sent-Received.py', 'DIO_sent_rec_plots', '{}.png', ['DIO_Sent', 'DIO_Received']),
+    'plot_data': ('Data-Received.py', 'data_sent_plots', '{}_data_packets.png', []),
+}
+
+# Folder of the plot scripts
+PLOT_SCRIPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Plot-Scripts')
+
+
+# Function to get the samples folders given in the config, each once
+def samples_folders(config):
+    folders = {}
+    for key in ('training_samples', 'test_samples'):
+        if config[key] is not None and config[key] not in folders.values():
+            folders[key] = config[key]
+    return folders
+
+
+# Function to get the path of the training or test data, by default the normalized data of its samples folder
+def data_path(config, key):
+    if config[key] is not None:
+        return config[key]
+    samples_key = 'training_samples' if key == 'train_data' else 'test_samples'
+    if config[samples_key] is None:
+        return None
+    return os.path.join(config[samples_key], NORMALIZED_NAMES[samples_key][1])
+
+
+# Function to list the runs of a samples folder that have a packet trace, with the trace path
+def trace_folders(samples_path):
+    runs = []
+    for folder_name in sorted(os.listdir(samples_path)):
+        folder_path = os.path.join(samples_path, folder_name)
+        if os.path.isdir(folder_path):
+            trace_path = find_trace_file(folder_path)
+            if trace_path is not None:
+                runs.append((folder_name, trace_path))
+    return runs
+
+
+# Function to list the work units of the count stage: one per run whose message counts are out of date
+def count_units(config):
+    units = []
+    for samples_path in samples_folders(config).values():
+        for folder_name, trace_path in trace_folders(samples_path):
+            counts_path = os.path.join(samples_path, folder_name, 'Sensor_Message_Counts.csv')
+            units.append((os.path.join(samples_path, folder_name), [trace_path], [counts_path],
+                          (samples_path, folder_name)))
+    return units
+
+
+# Function to count the messages of the stale runs, grouped by samples folder
+def run_count(config, units):
+    import FeatureCount
+    folders = {}
+    for samples_path, folder_name in (args for _, _, _, args in units):
+        folders.setdefault(samples_path, []).append(folder_name)
+    for samples_path, folder_names in folders.items():
+        results = FeatureCount.process_directories(samples_path, config['workers'], folder_names,
+                                                   config['topology_features'])
+        if any(isinstance(result, Exception) for result in results.values()):
+            raise RuntimeError(f"failed to count the messages of some runs in {samples_path}")
+
+
+# Function to list the work units of the normalize stage: one per samples folder
+def normalize_units(config):
+    units = []
+    for key, samples_path in samples_folders(config).items():
+        counts_paths = [os.path.join(samples_path, folder_name, 'Sensor_Message_Counts.csv')
+                        for folder_name in sorted(os.listdir(samples_path))]
+        counts_paths = [counts_path for counts_path in counts_paths if os.path.exists(counts_path)]
+        if not counts_paths:
+            continue
+        output_stems = [os.path.join(samples_path, name) for name in NORMALIZED_NAMES[key]]
+        units.append((samples_path, counts_paths, [dataset_path(stem) for stem in output_stems], output_stems))
+    return units
+
+
+# Function to normalize the message counts of the stale samples folders
+def run_normalize(config, units):
+    import Normalize
+    for samples_path, _, _, (file_with_index, file_no_index) in units:
+        Normalize.base_path = samples_path
+        Normalize.file_with_index = file_with_index
+        Normalize.file_no_index = file_no_index
+        Normalize.export_xlsx = config['export_xlsx']
+        Normalize.main()
+
+
+# Function to list the work unit of the classify stage, None when its data does not exist or the training data
+# has no labels
+def classify_units(config):
+    train_path = resolve_dataset(data_path(config, 'train_data')) if data_path(config, 'train_data') else None
+    test_path = resolve_dataset(data_path(config, 'test_data')) if data_path(config, 'test_data') else None
+    if train_path is None or test_path is None:
+        return None
+    if 'Label' not in dataset_columns(train_path):
+        print(f"Training data {train_path} has no 'Label' column, label it or give labelled train_data to classify.")
+        return None
+    outputs = []
+    for classifier_name in config['classifiers']:
+        output_file = DataClassifier.CLASSIFIERS[classifier_name][2]
+        outputs.append(dataset_path(os.path.join(config['output_path'], output_file)))
+        outputs.append(model_path(os.path.join(config['output_path'], 'Models'), output_file))
+    return [('classifiers', [train_path, test_path], outputs, None)]
+
+
+# Function to train the classifiers and predict the test data
+def run_classify(config, units):
+    os.chdir(config['output_path'])
+    DataClassifier.train_data_path = data_path(config, 'train_data')
+    DataClassifier.test_data_path = data_path(config, 'test_data')
+    DataClassifier.models_path = os.path.join(config['output_path'], 'Models')
+    DataClassifier.export_xlsx = config['export_xlsx']
+    timings = DataClassifier.main(config['classifiers'], config['workers'])
+    if timings is None or len(timings) < len(config['classifiers']):
+        raise RuntimeError("failed to train or predict with some classifiers, see the messages above")
+
+
+# Function to list the work unit of the evaluate stage, None when there are no actual labels or predictions
+def evaluate_units(config):
+    actual_path = resolve_dataset(config['actual_data']) if config['actual_data'] else None
+    if actual_path is None:
+        return None
+    inputs = [actual_path]
+    outputs = [os.path.join(config['output_path'], 'Metrics_Summary.csv')]
+    for classifier_name in config['classifiers']:
+        predicted_path = resolve_dataset(os.path.join(config['output_path'], DataClassifier.CLASSIFIERS[classifier_name][2]))
+        if predicted_path is None:
+            return None
+        inputs.append(predicted_path)
+        outputs.append(os.path.join(config['output_path'], f'Confusion_Matrix_{classifier_name}_CustomPalette.png'))
+    return [('metrics', inputs, outputs, None)]
+
+
+# Function to compute the metrics of all classifiers and plot them without a display
+def run_evaluate(config, units):
+    import confusion
+    import seaborn as sns
+    os.chdir(config['output_path'])
+    confusion.headless = True
+    models = {classifier_name: confusion.models.get(classifier_name, (DataClassifier.CLASSIFIERS[classifier_name][2],
+                                                                      sns.color_palette("Greys")))
+              for classifier_name in config['classifiers']}
+    confusion.evaluate_models(models, config['actual_data'], confusion.group_column)
+
+
+# Function to check from the up-to-date message counts of a run that the plot script draws no plot for it,
+# False when the counts are missing or older than the trace
+def nothing_to_plot(folder_path, trace_path, counters):
+    counts_path = os.path.join(folder_path, 'Sensor_Message_Counts.csv')
+    if not counters or is_stale([trace_path], [counts_path]):
+        return False
+    with open(counts_path, newline='') as file:
+        return all(float(value or 0) == 0 for row in csv.reader(file) if row[0] in counters for value in row[1:])
+
+
+# Function to list the work units of a plot stage: one per test run whose plot is out of date; runs without
+# the messages a plot shows get no plot, so they have no work unit
+def plot_units(config, stage_name):
+    if config['test_samples'] is None:
+        return None
+    _, plots_name, file_name, counters = PLOT_SCRIPTS[stage_name]
+    plots_folder = os.path.join(config['test_samples'], plots_name)
+    return [(folder_name, [trace_path], [os.path.join(plots_folder, file_name.format(folder_name))],
+             (folder_name, plots_folder))
+            for folder_name, trace_path in trace_folders(config['test_samples'])
+            if not nothing_to_plot(os.path.join(config['test_samples'], folder_name), trace_path, counters)]
+
+
+# Function to plot the stale test runs with one of the plot scripts
+def run_plots(config, units, stage_name):
+    script_name = PLOT_SCRIPTS[stage_name][0]
+    spec = importlib.util.spec_from_file_location(stage_name, os.path.join(PLOT_SCRIPTS_PATH, script_name))
+    plot_script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plot_script)
+    plot_script.fast_mode = config['fast_plots']
+    for _, _, _, (folder_name, plots_folder) in units:
+        os.makedirs(plots_folder, exist_ok=True)
+        plot_script.plot_folder(config['test_samples'], folder_name, plots_folder)
+
+
+# Stages of the pipeline: the stages they wait for, the function listing their work units and the one running them
+STAGES = {
+    'count': ([], count_units, run_count),
+    'normalize': (['count'], normalize_units, run_normalize),
+    'classify': (['normalize'], classify_units, run_classify),
+    'evaluate': (['classify'], evaluate_units, run_evaluate),
+    **{stage_name: ([], lambda config, stage_name=stage_name: plot_units(config, stage_name),
+                    lambda config, units, stage_name=stage_name: run_plots(config, units, stage_name))
+       for stage_name in PLOT_SCRIPTS},
+}
+
+
+# Function to check whether a work unit has to run: an output is missing or older than an input
+def is_stale(inputs, outputs):
+    if any(not os.path.exists(output) for output in outputs):
+        return True
+    if not inputs:
+        return False
+    return max(os.path.getmtime(path) for path in inputs) > min(os.path.getmtime(path) for path in outputs)
+
+
+# Function to run a stage in a worker process, returning the profiled steps it ran
+def run_stage(stage_name, config, units):
+    # Worker processes are reused, only report the steps of this stage
+    Profiler.reset_steps()
+    Profiler.cprofile_path = config['cprofile_path']
+    with profile_step(stage_name):
+        STAGES[stage_name][2](config, units)
+    return Profiler.profiled_steps()
+
+
+# Function to run the selected stages in dependency order, independent stages at the same time
+def run_pipeline(config, stage_names=None, force=False, dry_run=False):
+    stage_names = list(STAGES) if stage_names is None else stage_names
+    # Dependencies outside the selected stages are taken as done
+    waiting = {stage_name: [dependency for dependency in STAGES[stage_name][0] if dependency in stage_names]
+               for stage_name in stage_names}
+    results = {}
+    # Failed stages, and the failed stages each skipped stage waited for
+    failed_stages = {}
+    running = {}
+    steps = []
+
+    with ProcessPoolExecutor(max_workers=config['stage_workers']) as executor:
+        while waiting or running:
+            # Start every stage whose dependencies have finished, listing its stale work once they have
+            for stage_name in [name for name, dependencies in waiting.items() if all(d in results for d in dependencies)]:
+                # The outputs of a failed stage are stale, the stages using them, directly or not, do not run
+                failed = list(dict.fromkeys(failed_stage for dependency in waiting.pop(stage_name)
+                                            for failed_stage in failed_stages.get(dependency, [])))
+                if failed:
+                    failed_stages[stage_name] = failed
+                    results[stage_name] = f"skipped, {', '.join(failed)} failed"
+                    continue
+                # In a dry run the inputs of a stage may only appear once the stages it waits for have run
+                pending = [d for d in STAGES[stage_name][0] if results.get(d, '').startswith(('would run', 'waits for'))]
+                if dry_run and pending:
+                    results[stage_name] = f"waits for {', '.join(pending)}"
+                    continue
+                units = STAGES[stage_name][1](config)
+                if not units:
+                    results[stage_name] = 'skipped, inputs not found'
+                    continue
+                stale_units = units if force else [unit for unit in units if is_stale(unit[1], unit[2])]
+                if not stale_units:
+                    results[stage_name] = 'up to date'
+                    continue
+                if dry_run:
+                    results[stage_name] = f'would run {len(stale_units)} of {len(units)} work units'
+                    continue
+                print(f"Running {stage_name} on {len(stale_units)} of {len(units)} work units...")
+                running[executor.submit(run_stage, stage_name, config, stale_units)] = (stage_name, len(stale_units))
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage_name, unit_count = running.pop(future)
+                try:
+                    stage_steps = [dict(step, stage=stage_name) for step in future.result()]
+                except Exception as e:
+                    results[stage_name] = f'failed: {e}'
+                    failed_stages[stage_name] = [stage_name]
+                    continue
+                steps.extend(stage_steps)
+                stage_time = next(step['wall_s'] for step in stage_steps if step['step'] == stage_name)
+                results[stage_name] = f"ran {unit_count} work units in {stage_time:.2f} s"
+
+    # Report what each stage did, in pipeline order
+    for stage_name in stage_names:
+        print(f"{stage_name:10s} {results[stage_name]}")
+
+    # Save the time, memory and rows of every stage and step of this run
+    if config['profile'] and steps:
+        report_stem = os.path.join(config['output_path'], 'Profiles', f"pipeline_{time.strftime('%Y%m%d-%H%M%S')}")
+        print(f"Profile saved to {', '.join(Profiler.save_report(steps, report_stem))}")
+    return results
+
+
+# Function to combine the defaults, the config file and the command line arguments into one config
+def load_config(args):
+    config = dict(DEFAULT_CONFIG)
+    if args.config is not None:
+        with open(args.config) as file:
+            file_config = json.load(file)
+        unknown_keys = set(file_config) - set(config)
+        if unknown_keys:
+            raise ValueError(f"Unknown settings in {args.config}: {', '.join(sorted(unknown_keys))}")
+        config.update(file_config)
+    config.update({key: value for key, value in vars(args).items() if key in config and value is not None})
+
+    # Stages run in other folders, so the paths have to be absolute
+    for key in ('training_samples', 'test_samples', 'train_data', 'test_data', 'actual_data', 'output_path',
+                'cprofile_path'):
+        if config[key] is not None:
+            config[key] = os.path.abspath(config[key])
+    unknown_classifiers = [name for name in config['classifiers'] if name not in DataClassifier.CLASSIFIERS]
+    if unknown_classifiers:
+        raise ValueError(f"Unknown classifiers: {', '.join(unknown_classifiers)}")
+    return config
+
+
+# Function to parse the command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the attack detection pipeline, skipping the stages that are up to date.")
+    parser.add_argument('--config', help="JSON file with the settings, the command line overrides it")
+    parser.add_argument('--training-samples', dest='training_samples', help="folder of the training runs")
+    parser.add_argument('--test-samples', dest='test_samples', help="folder of the test runs")
+    parser.add_argument('--train-data', dest='train_data', help="labelled training data, without extension")
+    parser.add_argument('--test-data', dest='test_data', help="test data, without extension")
+    parser.add_argument('--actual-data', dest='actual_data', help="actual labels of the test data, without extension")
+    parser.add_argument('--output', dest='output_path', help="folder for the models, predictions and metrics")
+    parser.add_argument('--classifiers', nargs='+', help="classifiers to train")
+    parser.add_argument('--workers', type=int, help="folders or classifiers processed in parallel inside a stage")
+    parser.add_argument('--stage-workers', dest='stage_workers', type=int, help="stages run at the same time")
+    parser.add_argument('--export-xlsx', dest='export_xlsx', action='store_true', default=None,
+                        help="also write the data and predictions as Excel files")
+    parser.add_argument('--fast-plots', dest='fast_plots', action='store_true', default=None,
+                        help="skip the count labels on plots of large runs")
+    parser.add_argument('--topology-features', dest='topology_features', action='store_true', default=None,
+                        help="append the DODAG topology features to the message counts")
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help="save a JSON and CSV report of the time, memory and rows of every step")
+    parser.add_argument('--cprofile', dest='cprofile_path', help="folder to write the cProfile stats of each stage to")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help="stages to run, all by default")
+    parser.add_argument('--force', action='store_true', help="run the stages even when they are up to date")
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true', help="only report what would run")
+    return parser.parse_args(argv)
+
+
+# Main function to run the pipeline from the command line
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        config = load_config(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    if not samples_folders(config) and config['train_data'] is None:
+        print("Error: give the training or test samples folder, on the command line or in the config file.")
+        return 2
+    os.makedirs(config['output_path'], exist_ok=True)
+
+    results = run_pipeline(config, args.stages, args.force, args.dry_run)
+    return 1 if any(result.startswith('failed') for result in results.values()) else 0
+
+
+# Run the pipeline
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import pandas as pd
+import csv
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import seaborn as sns
+import confusion
+import DataClassifier
+import FeatureCount
+import Normalize
+import Profiler
+from DatasetIO import dataset_path, read_dataset, resolve_dataset, write_dataset
+from Profiler import profile_step
+from TraceGenerator import LABELS_FILE_NAME, generate_runs
+from TraceReader import trace_cache_path
+
+# Rows per trace the pipeline is benchmarked at; 10**7 and 10**8 rows need minutes to hours and GBs of disk per run
+row_counts = [10**5, 10**6]
+
+# Training runs generated per scale, with as many test runs, and the make-up of each run
+run_count = 4
+sensor_count = 50
+malicious_count = 3
+
+# Folder the generated runs are kept in between benchmarks and the results are appended to
+benchmark_path = os.path.join(os.getcwd(), 'Benchmarks')
+RESULTS_FILE_NAME = 'benchmark_results.csv'
+
+# Columns of the results file, one row per stage of every benchmark run
+RESULT_COLUMNS = ['timestamp', 'commit', 'python', 'machine', 'row_count', 'run_count', 'sensor_count',
+                  'malicious_count', 'stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows']
+
+# Stages timed end to end, in the order they run
+BENCHMARK_STAGES = ['FeatureCount', 'FeatureCount (cached)', 'Normalize', 'DataClassifier', 'confusion']
+
+
+# Function to get the commit the benchmarked code is at, empty outside a git checkout
+def current_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip()
+    except OSError:
+        return ''
+
+
+# Function to generate the training and test runs of a scale, unless an earlier benchmark already did
+def prepare_runs(data_path, row_count):
+    for samples, seed in (('train', 1000), ('test', 2000)):
+        samples_path = os.path.join(data_path, samples)
+        # The labels are written after the trace, so they mark a complete run
+        if not os.path.exists(os.path.join(samples_path, f'run{run_count - 1}', LABELS_FILE_NAME)):
+            print(f"Generating {run_count} {samples} runs of {row_count} rows...")
+            generate_runs(samples_path, run_count, row_count, sensor_count, malicious_count, seed)
+
+
+# Function to remove everything the pipeline derived from the runs, so every benchmark starts cold
+def clean_outputs(data_path):
+    for samples in ('train', 'test'):
+        samples_path = os.path.join(data_path, samples)
+        for name in os.listdir(samples_path):
+            path = os.path.join(samples_path, name)
+            if os.path.isdir(path):
+                # The message counts and columnar cache of a run
+                for derived_path in (os.path.join(path, 'Sensor_Message_Counts.csv'),
+                                     trace_cache_path(os.path.join(path, 'Packet Trace.csv'))):
+                    if os.path.exists(derived_path):
+                        os.remove(derived_path)
+            else:
+                # The normalized data and manifest of the samples folder
+                os.remove(path)
+    shutil.rmtree(os.path.join(data_path, 'output'), ignore_errors=True)
+    os.makedirs(os.path.join(data_path, 'output'))
+
+
+# Function to add the true labels of the generated runs to normalized data
+def labelled_dataset(samples_path):
+    df = read_dataset(resolve_dataset(os.path.join(samples_path, 'normalized')))
+    labels = pd.concat({run: pd.read_csv(os.path.join(samples_path, run, LABELS_FILE_NAME), index_col=0)['Label']
+                        for run in df['Sensor'].unique()})
+    df['Label'] = labels.reindex(pd.MultiIndex.from_arrays([df['Sensor'], df.index]), fill_value=0).to_numpy()
+    return df
+
+
+# Function to run the pipeline on one scale, timing each stage
+def run_stages(data_path):
+    train_path = os.path.join(data_path, 'train')
+    test_path = os.path.join(data_path, 'test')
+    output_path = os.path.join(data_path, 'output')
+
+    with profile_step('FeatureCount'):
+        FeatureCount.process_directories(train_path)
+        FeatureCount.process_directories(test_path)
+
+    # Again, with the columnar trace cache the first pass wrote
+    with profile_step('FeatureCount (cached)'):
+        FeatureCount.process_directories(train_path)
+        FeatureCount.process_directories(test_path)
+
+    with profile_step('Normalize'):
+        Normalize.export_xlsx = False
+        Normalize.incremental = False
+        for samples_path, file_no_index in ((train_path, 'training_data'), (test_path, 'test_data')):
+            Normalize.base_path = samples_path
+            Normalize.file_with_index = os.path.join(samples_path, 'normalized')
+            Normalize.file_no_index = os.path.join(samples_path, file_no_index)
+            Normalize.main()
+
+    # Label the data the way it is labelled by hand, not timed
+    train_df = labelled_dataset(train_path).drop(columns=['Sensor']).reset_index(drop=True)
+    write_dataset(train_df, dataset_path(os.path.join(train_path, 'training_data')))
+    write_dataset(labelled_dataset(test_path), dataset_path(os.path.join(output_path, 'actual_data')))
+
+    # The classifiers and metrics write to the working directory
+    working_directory = os.getcwd()
+    os.chdir(output_path)
+    try:
+        with profile_step('DataClassifier'):
+            DataClassifier.train_data_path = os.path.join(train_path, 'training_data')
+            DataClassifier.test_data_path = os.path.join(test_path, 'test_data')
+            DataClassifier.models_path = os.path.join(output_path, 'Models')
+            DataClassifier.export_xlsx = False
+            DataClassifier.main()
+
+        with profile_step('confusion'):
+            confusion.headless = True
+            models = {classifier_name: confusion.models.get(classifier_name, (DataClassifier.CLASSIFIERS[classifier_name][2],
+                                                                              sns.color_palette("Greys")))
+                      for classifier_name in DataClassifier.classifiers}
+            confusion.evaluate_models(models, os.path.join(output_path, 'actual_data'), confusion.group_column)
+    finally:
+        os.chdir(working_directory)
+
+
+# Function to append the stage timings of a benchmark run to the results file
+def save_results(results_path, stage_results):
+    new_file = not os.path.exists(results_path)
+    with open(results_path, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(stage_results)
+
+
+# Function to compare a benchmark run with the previous run at the same scale
+def compare_with_previous(results_path, stage_results):
+    results = pd.read_csv(results_path, dtype={'commit': str})
+    scale = stage_results[0]
+    same_scale = results[(results['row_count'] == scale['row_count']) & (results['run_count'] == scale['run_count'])
+                         & (results['sensor_count'] == scale['sensor_count'])
+                         & (results['malicious_count'] == scale['malicious_count'])]
+    previous = same_scale[same_scale['timestamp'] < scale['timestamp']]
+    current = pd.DataFrame(stage_results).set_index('stage')['wall_s']
+    if previous.empty:
+        print(current.to_string(float_format='{:.3f}'.format))
+        return
+
+    last = previous[previous['timestamp'] == previous['timestamp'].max()]
+    comparison = pd.DataFrame({'previous (s)': last.set_index('stage')['wall_s'], 'current (s)': current})
+    comparison['change'] = (comparison['current (s)'] / comparison['previous (s)'] - 1).map('{:+.1%}'.format)
+    print(f"Compared with the run of {last['timestamp'].iloc[0]} at commit {last['commit'].iloc[0]}:")
+    print(comparison.reindex(BENCHMARK_STAGES).to_string(float_format='{:.3f}'.format))
+
+
+# Main function to benchmark the pipeline end to end at each scale and store the results
+def main(row_counts):
+    results_path = os.path.join(benchmark_path, RESULTS_FILE_NAME)
+    os.makedirs(benchmark_path, exist_ok=True)
+    for row_count in row_counts:
+        data_path = os.path.join(benchmark_path, 'data',
+                                 f'{row_count}rows_{run_count}runs_{sensor_count}sensors_{malicious_count}malicious')
+        prepare_runs(data_path, row_count)
+        clean_outputs(data_path)
+
+        print(f"Benchmarking {run_count} + {run_count} runs of {row_count} rows...")
+        Profiler.reset_steps()
+        run_stages(data_path)
+        steps = Profiler.profiled_steps()
+
+        # Keep every step for a closer look, and the stages in the results compared over time
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        Profiler.save_report(steps, os.path.join(benchmark_path, 'Profiles', f"{timestamp.replace(':', '')}_{row_count}rows"))
+        metadata = {'timestamp': timestamp, 'commit': current_commit(), 'python': platform.python_version(),
+                    'machine': f'{platform.system()} {platform.machine()} {os.cpu_count()} CPUs', 'row_count': row_count,
+                    'run_count': run_count, 'sensor_count': sensor_count, 'malicious_count': malicious_count}
+        stage_results = [dict(metadata, stage=step['step'], wall_s=step['wall_s'], cpu_s=step['cpu_s'],
+                              peak_rss_mb=step['peak_rss_mb'], rows=step['rows'])
+                         for step in steps if step['step'] in BENCHMARK_STAGES]
+        save_results(results_path, stage_results)
+        compare_with_previous(results_path, stage_results)
+
+    print(f"Results saved to {results_path}")
+
+
+# Run the benchmark, optionally at the comma-separated row counts, run count and sensor count given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        row_counts = [int(float(row_count)) for row_count in sys.argv[1].split(',')]
+    if len(sys.argv) > 2:
+        run_count = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        sensor_count = int(sys.argv[3])
+    main(row_counts)
@@ -1,66 +1,66 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
+import sys
+
+# Make the shared trace reader and plot renderer in the parent folder importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from TraceReader import count_trace, find_trace_file
+from PlotRenderer import render_bar_chart, render_folders
 
 # Define the base path where the folders are located
 base_path = "C:\\Users\\mihit\\Documents\\NetSim\\Workspaces\\Attack_detection_in_IoT\\Test-Samples"
 plots_folder = os.path.join(base_path, "DAO_sent_rec_plots")
 
-# Create the plots folder if it doesn't exist
-os.makedirs(plots_folder, exist_ok=True)
-
-# Iterate over each immediate subfolder in the base path
-for subfolder in os.listdir(base_path):
+# Number of folders plotted in parallel, 1 plots them one at a time
+workers = 1
+
+# Fast mode skips the count labels on top of the bars for runs with more than annotation_limit sensors
+fast_mode = False
+annotation_limit = 50
+
+# Layout of the DAO plot
+DAO_CHART = {
+    'name': 'DAO',
+    'series': [('DAO Sent', 'skyblue'), ('DAO Received', 'lightgreen')],
+    'bar_width': 0.3,
+    'bar_spacing': 0.3 * 1.5,
+    'title': 'DAO Messages Sent and Received',
+    'title_size': 20,
+    'ylabel': 'DAO Messages',
+    'label_size': 16,
+    'tick_size': 12,
+    'legend_title': 'Message Type',
+    'legend_size': 10,
+}
+
+
+# Function to plot the DAO messages sent and received by each sensor of one subfolder
+def plot_folder(base_path, subfolder, plots_folder):
     subfolder_path = os.path.join(base_path, subfolder)
-
-    # Check if it's a directory (immediate subfolder)
-    if not os.path.isdir(subfolder_path):
-        print(f"Skipping {subfolder_path}, not a directory.")
-        continue
-
     print(f"Processing subfolder: {subfolder}")
 
-    # Check if 'Packet Trace.csv' exists in the subfolder
-    file_path = os.path.join(subfolder_path, 'Packet Trace.csv')
-    if not os.path.exists(file_path):
+    # Check if 'Packet Trace.csv' exists in the subfolder, plain or compressed
+    file_path = find_trace_file(subfolder_path)
+    if file_path is None:
         print(f"'Packet Trace.csv' not found in {subfolder_path}. Skipping...")
-        continue
+        return
 
     print(f"'Packet Trace.csv' found in {subfolder_path}. Processing...")
 
-    # Load the packet trace file
+    # Count DAO messages sent and received by each sensor in a single pass over the trace
     try:
-        df = pd.read_csv(file_path, encoding='latin1')
+        trace_counts = count_trace(file_path)
         print(f"Data loaded successfully from {file_path}")
     except Exception as e:
         print(f"Error loading file {file_path}: {e}")
-        continue
-
-    # Verify required columns exist
-    required_columns = {'PACKET_TYPE', 'CONTROL_PACKET_TYPE/APP_NAME', 'SOURCE_ID', 'RECEIVER_ID', 'PACKET_STATUS'}
-    if not required_columns.issubset(df.columns):
-        print(f"Required columns are missing in {file_path}. Skipping...")
-        continue
+        return
 
-    # Filter for 'Control_Packet' type and 'Successful' status
-    control_packets = df[(df['PACKET_TYPE'] == 'Control_Packet') & (df['PACKET_STATUS'] == 'Successful')]
+    sent_dao = trace_counts['DAO_Sent']
+    received_dao = trace_counts['DAO_Received']
 
-    # Filter DAO messages
-    dao_packets = control_packets[control_packets['CONTROL_PACKET_TYPE/APP_NAME'] == 'DAO']
-
-    if dao_packets.empty:
+    if sent_dao.empty and received_dao.empty:
         print(f"No DAO messages found in {file_path}. Skipping...")
-        continue
-
-    # Count DAO messages sent by each sensor
-    sent_dao = dao_packets[~dao_packets['SOURCE_ID'].str.contains('SINKNODE|ROUTER', case=False)]['SOURCE_ID'].value_counts()
-
-    # Count DAO messages received by each sensor
-    received_dao = dao_packets[~dao_packets['RECEIVER_ID'].str.contains('SINKNODE|ROUTER', case=False)]['RECEIVER_ID'].value_counts()
-
-    # Abbreviate sensor names
-    sent_dao.index = sent_dao.index.str.replace('SENSOR-', 'S-')
-    received_dao.index = received_dao.index.str.replace('SENSOR-', 'S-')
+        return
 
     # Identify malicious nodes based on received DAO messages
     malicious_nodes = received_dao.index.tolist()
@@ -74,48 +74,25 @@ for subfolder in os.listdir(base_path):
 
     if combined_counts.empty:
         print(f"No data available for plotting in {subfolder_path}. Skipping plot...")
-        continue
+        return
 
     print(f"Combined counts:\n{combined_counts}")
 
     # Plotting
     try:
-        fig, ax = plt.subplots(figsize=(15, 8))
-        bar_width = 0.3
-        index = range(len(combined_counts))
-
-        # Plot bars for sent and received messages
-        bars_sent = ax.bar(index, combined_counts['Sent'], bar_width, label='DAO Sent', color='skyblue')
-        bars_received = ax.bar([i + bar_width * 1.5 for i in index], combined_counts['Received'], bar_width, label='DAO Received', color='lightgreen')
-
-        # Add count labels
-        for bar in bars_sent + bars_received:
-            height = bar.get_height()
-            ax.annotate(f'{int(height)}',
-                        (bar.get_x() + bar.get_width() / 2., height),
-                        ha='center', va='bottom', fontsize=12, rotation=90, xytext=(0, 5), textcoords='offset points')
-
-        # Customize the plot
-        ax.set_title(f'DAO Messages Sent and Received', fontsize=20)
-        ax.set_xlabel('Sensor ID', fontsize=16)
-        ax.set_ylabel('DAO Messages', fontsize=16)
-        ax.set_xticks([i + bar_width * 1.5 / 2 for i in index])
-        ax.set_xticklabels(combined_counts.index, rotation=45, ha='center', fontsize=12)
-
-        # Highlight malicious nodes in red
-        for label in ax.get_xticklabels():
-            if label.get_text() in malicious_nodes:
-                label.set_color('red')
-
-        ax.legend(title="Message Type", fontsize=10)
-
-        plt.tight_layout()
-
         # Save the plot in the plots folder with subfolder name
         plot_output_path = os.path.join(plots_folder, f'{subfolder}.png')
-        plt.savefig(plot_output_path)
+        annotate = not (fast_mode and len(combined_counts) > annotation_limit)
+        render_bar_chart(DAO_CHART, combined_counts.index, [combined_counts['Sent'], combined_counts['Received']],
+                         plot_output_path, highlighted=malicious_nodes, annotate=annotate)
         print(f"Plot saved to {plot_output_path}")
-        plt.close()
 
     except Exception as e:
         print(f"Error during plotting: {e}")
+
+
+# Plot every subfolder of the base path
+if __name__ == "__main__":
+    # Create the plots folder if it doesn't exist
+    os.makedirs(plots_folder, exist_ok=True)
+    render_folders(plot_folder, base_path, plots_folder, workers)
@@ -0,0 +1,126 @@
+import matplotlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from Profiler import profile_step
+
+# Render without a display so batch jobs never open or block on windows
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Figure of each chart kind kept by this process, reused while the number of sensors stays the same
+_figures = {}
+
+# Figure margins that tight_layout adjusts
+SUBPLOT_PARAMS = ['left', 'right', 'bottom', 'top', 'wspace', 'hspace']
+
+
+# Function to get the positions of the bars of each series and of the tick labels
+def bar_positions(chart, bar_count):
+    index = range(bar_count)
+    spacing = chart.get('bar_spacing', 0)
+    series_positions = [[i + spacing * position for i in index] for position in range(len(chart['series']))]
+    tick_positions = [i + spacing * (len(chart['series']) - 1) / 2 for i in index]
+    return series_positions, tick_positions
+
+
+# Function to draw a new figure of a chart kind with empty bars, annotations and static text
+def draw_figure(chart, bar_count, annotate):
+    fig, ax = plt.subplots(figsize=chart.get('figsize', (15, 8)))
+    series_positions, tick_positions = bar_positions(chart, bar_count)
+
+    # Plot empty bars for each series, their heights are set when a folder is rendered
+    bar_groups = []
+    for (label, color), positions in zip(chart['series'], series_positions):
+        bar_groups.append(ax.bar(positions, [0] * bar_count, chart.get('bar_width', 0.8), label=label, color=color,
+                                 **chart.get('bar_kwargs', {})))
+    bars = [bar for group in bar_groups for bar in group]
+
+    # Add count labels on top of the bars
+    annotations = []
+    if annotate:
+        for bar in bars:
+            annotations.append(ax.annotate('0', (bar.get_x() + bar.get_width() / 2., 0),
+                                           ha='center', va='bottom', fontsize=12, rotation=90, xytext=(0, 5),
+                                           textcoords='offset points'))
+
+    # Customize the plot
+    ax.set_title(chart['title'], fontsize=chart['title_size'])
+    ax.set_xlabel('Sensor ID', fontsize=chart['label_size'])
+    ax.set_ylabel(chart['ylabel'], fontsize=chart['label_size'])
+    ax.set_xticks(tick_positions)
+    if chart.get('legend_title') is not None:
+        ax.legend(title=chart['legend_title'], fontsize=chart['legend_size'])
+
+    return {'figure': fig, 'axes': ax, 'bars': bars, 'annotations': annotations,
+            'bar_count': bar_count, 'annotate': annotate}
+
+
+# Function to render a bar chart of one folder's counts and save it, reusing the figure of the last folder
+def render_bar_chart(chart, sensor_ids, series_values, output_path, highlighted=(), annotate=True):
+    sensor_ids = list(sensor_ids)
+    bar_count = len(sensor_ids)
+
+    # Draw a new figure only when the layout changed since the last chart of this kind
+    state = _figures.get(chart['name'])
+    if state is None or state['bar_count'] != bar_count or state['annotate'] != annotate:
+        if state is not None:
+            plt.close(state['figure'])
+        state = _figures[chart['name']] = draw_figure(chart, bar_count, annotate)
+    fig, ax = state['figure'], state['axes']
+
+    try:
+        with profile_step(f"plot {chart['name']}", rows=bar_count):
+            # Only the bar heights, count labels and tick labels change between folders
+            heights = [height for values in series_values for height in values]
+            for bar, height in zip(state['bars'], heights):
+                bar.set_height(height)
+            for annotation, bar, height in zip(state['annotations'], state['bars'], heights):
+                annotation.xy = (bar.get_x() + bar.get_width() / 2., height)
+                annotation.set_text(f'{int(height)}')
+            ax.relim()
+            ax.autoscale_view()
+
+            # Highlight the given sensor IDs in red
+            ax.set_xticklabels(sensor_ids, rotation=45, ha='center', fontsize=chart['tick_size'])
+            tick_color = plt.rcParams['xtick.labelcolor']
+            tick_color = plt.rcParams['xtick.color'] if tick_color == 'inherit' else tick_color
+            for label in ax.get_xticklabels():
+                label.set_color('red' if label.get_text() in highlighted else tick_color)
+
+            # Lay out from the default margins, as a new figure would, not from the last folder's layout
+            fig.subplots_adjust(**{param: plt.rcParams[f'figure.subplot.{param}'] for param in SUBPLOT_PARAMS})
+            fig.tight_layout()
+            fig.savefig(output_path)
+    except Exception:
+        # Do not reuse a figure left half updated
+        plt.close(fig)
+        _figures.pop(chart['name'], None)
+        raise
+
+
+# Function to list the immediate subfolders of a base folder to plot, in directory order
+def list_plot_folders(base_path):
+    subfolders = []
+    for subfolder in os.listdir(base_path):
+        subfolder_path = os.path.join(base_path, subfolder)
+        if not os.path.isdir(subfolder_path):
+            print(f"Skipping {subfolder_path}, not a directory.")
+            continue
+        subfolders.append(subfolder)
+    return subfolders
+
+
+# Function to plot every folder, spread across a pool of worker processes that each reuse their figures
+def render_folders(plot_folder, base_path, plots_folder, workers=1):
+    subfolders = list_plot_folders(base_path)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(plot_folder, base_path, subfolder, plots_folder) for subfolder in subfolders]
+            for subfolder, future in zip(subfolders, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error plotting {subfolder}: {e}")
+    else:
+        for subfolder in subfolders:
+            plot_folder(base_path, subfolder, plots_folder)
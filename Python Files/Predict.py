@@ -0,0 +1,61 @@
+import time
+from DatasetIO import read_dataset, resolve_dataset
+from FeatureStore import load_feature_matrix
+from DataClassifier import CLASSIFIERS, classifiers, models_path, predict_in_batches, save_predictions, test_data_path
+from ModelStore import load_model, model_path
+
+
+# Function to score the test data with a saved classifier, without retraining it; the test features are the
+# float32 matrix mapped from their feature file, as DataClassifier.py trains and scores on
+def predict_with_saved_model(classifier_name, test_df, test):
+    if classifier_name not in CLASSIFIERS:
+        print("Invalid classifier selected!")
+        return None
+
+    # Load the model saved by DataClassifier.py
+    saved_model_path = model_path(models_path, CLASSIFIERS[classifier_name][2])
+    artifact = load_model(saved_model_path)
+    if artifact is None:
+        print(f"No saved {classifier_name} classifier found at {saved_model_path}, run DataClassifier.py first.")
+        return None
+
+    # Score the features in the order the model was trained on
+    missing_features = [name for name in artifact['feature_names'] if name not in test['feature_names']]
+    if missing_features:
+        print(f"Error: test data is missing the features {missing_features} used by the {classifier_name} classifier.")
+        return None
+    X_test = test['X']
+    if test['feature_names'] != artifact['feature_names']:
+        X_test = X_test[:, [test['feature_names'].index(name) for name in artifact['feature_names']]]
+
+    print(f"Predicting with saved {classifier_name} classifier...")
+    start = time.perf_counter()
+    predictions = predict_in_batches(artifact['model'], X_test)
+    predict_time = time.perf_counter() - start
+
+    save_predictions(test_df, predictions, classifier_name)
+
+    return {'Classifier': classifier_name, 'Predict (s)': predict_time}
+
+
+# Main function to score the test data with all saved classifiers
+def main(classifier_names=None):
+    classifier_names = classifiers if classifier_names is None else classifier_names
+
+    # Map the test features once for all classifiers, and load the test data the predictions are saved with
+    test_path = resolve_dataset(test_data_path)
+    if test_path is None:
+        print("Test data not found!")
+        return
+    test = load_feature_matrix(test_data_path)
+    test_df = read_dataset(test_path)
+
+    for classifier_name in classifier_names:
+        result = predict_with_saved_model(classifier_name, test_df, test)
+        if result is not None:
+            print(f"{classifier_name} predicted {len(test_df)} rows in {result['Predict (s)']:.3f} s")
+
+
+# Run the main function
+if __name__ == "__main__":
+    main()
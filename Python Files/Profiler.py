@@ -0,0 +1,128 @@
+import cProfile
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak RSS is then not reported
+    resource = None
+
+# Folder the cProfile stats of every top-level step are written to, None to not run cProfile
+cprofile_path = os.environ.get('PROFILE_CPROFILE_PATH')
+
+# Columns of the profile reports
+REPORT_COLUMNS = ['stage', 'step', 'calls', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows', 'rows_per_s']
+
+# Totals of every step run by this process, in the order the steps first ran
+_steps = {}
+_steps_lock = threading.Lock()
+
+# Steps open in each thread, nested steps are named after the steps they run in
+_open_steps = threading.local()
+
+# cProfile profilers of the top-level steps, reused so repeated steps add up in one stats file
+_profilers = {}
+
+
+# Function to get the peak resident memory of this process so far, in MB
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Function to add one run of a step to its totals
+def record_step(name, wall, cpu, rows):
+    peak = peak_rss_mb()
+    with _steps_lock:
+        step = _steps.setdefault(name, {'step': name, 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                        'peak_rss_mb': None, 'rows': None})
+        step['calls'] += 1
+        step['wall_s'] += wall
+        step['cpu_s'] += cpu
+        if peak is not None:
+            step['peak_rss_mb'] = max(peak, step['peak_rss_mb'] or 0)
+        if rows is not None:
+            step['rows'] = (step['rows'] or 0) + rows
+
+
+# Function to time a step: wall time, CPU time of the process, peak RSS at its end and rows processed,
+# the rows can also be set on the dict it yields
+@contextmanager
+def profile_step(name, rows=None):
+    if not hasattr(_open_steps, 'names'):
+        _open_steps.names = []
+    _open_steps.names.append(name)
+    step_name = '/'.join(_open_steps.names)
+    step = {'rows': rows}
+
+    # Only one profiler can run at a time, so only the top-level steps of the main thread are profiled
+    profiler = None
+    if cprofile_path is not None and len(_open_steps.names) == 1 and threading.current_thread() is threading.main_thread():
+        profiler = _profilers.setdefault(name, cProfile.Profile())
+        profiler.enable()
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield step
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(cprofile_path, exist_ok=True)
+            profiler.dump_stats(os.path.join(cprofile_path, f'{name}.prof'))
+        _open_steps.names.pop()
+        record_step(step_name, wall, cpu, step['rows'])
+
+
+# Function to time each chunk read from an iterator as a step, with the chunk's length as its rows
+def profile_chunks(name, chunks):
+    chunks = iter(chunks)
+    while True:
+        with profile_step(name) as step:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                step['rows'] = len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+# Function to get the totals of the steps run by this process
+def profiled_steps():
+    with _steps_lock:
+        return [dict(step) for step in _steps.values()]
+
+
+# Function to forget the steps run so far, before profiling a new run
+def reset_steps():
+    with _steps_lock:
+        _steps.clear()
+
+
+# Function to save the steps of a run as a JSON and a CSV report, returning the paths written
+def save_report(steps, path_stem):
+    rows = []
+    for step in steps:
+        row = {column: step.get(column) for column in REPORT_COLUMNS}
+        if row['rows'] and row['wall_s']:
+            row['rows_per_s'] = row['rows'] / row['wall_s']
+        rows.append(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path_stem)), exist_ok=True)
+    json_path, csv_path = path_stem + '.json', path_stem + '.csv'
+    with open(json_path, 'w') as file:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(), 'steps': rows}, file, indent=2)
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return [json_path, csv_path]
@@ -0,0 +1,158 @@
+import argparse
+import csv
+import os
+import sys
+
+# Command-line entry point for NetSim post-run hooks: counts and scores one run per call. pandas, the
+# trace reader and scikit-learn are imported by the step that needs them, not at startup, and models
+# with a numpy-only export are scored without importing scikit-learn at all
+
+# Folder the models saved by DataClassifier.py are read from
+models_path = os.path.join(os.getcwd(), 'Models')
+
+# Files of a run: the message counts FeatureCount.py writes and the predictions written here
+COUNTS_FILE_NAME = 'Sensor_Message_Counts.csv'
+PREDICTIONS_FILE_NAME = 'Sensor_Predictions.csv'
+
+# Extension of the saved models, as in ModelStore.py, which is only imported to score
+MODEL_EXTENSION = '.joblib'
+
+# Names a run's trace may have, plain or compressed, and the counters of the message counts, as in
+# TraceReader.py, which is only imported to count
+TRACE_FILE_NAMES = ['Packet Trace.csv', 'Packet Trace.csv.gz', 'Packet Trace.csv.zst', 'Packet Trace.csv.xz']
+COUNTER_NAMES = ['DAO_Sent', 'DAO_Received', 'DIO_Sent', 'DIO_Received', 'Packet_Received']
+
+# Names of the predicted labels
+LABEL_NAMES = {0: 'benign', 1: 'malicious'}
+
+
+# Function to read the feature names of a message counts file without parsing its values
+def counts_features(counts_path):
+    with open(counts_path, newline='') as file:
+        return [row[0] for row in csv.reader(file)][1:]
+
+
+# Function to find the trace of a run without importing the trace reader, None if it has none
+def find_trace(folder_path):
+    for file_name in TRACE_FILE_NAMES:
+        file_path = os.path.join(folder_path, file_name)
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+
+# Function to count the messages of a run unless its counts are newer than its trace and have the features
+# needed; the topology features are added when needed
+def ensure_counts(folder_path, needed_features=()):
+    counts_path = os.path.join(folder_path, COUNTS_FILE_NAME)
+    trace_path = find_trace(folder_path)
+    fresh = os.path.exists(counts_path) and (trace_path is None or
+                                             os.path.getmtime(counts_path) >= os.path.getmtime(trace_path))
+    if fresh and set(needed_features) <= set(counts_features(counts_path)):
+        return counts_path
+    if trace_path is None:
+        print(f"No 'Packet Trace.csv' or message counts found in {folder_path}.")
+        return None
+    return count_run(folder_path, topology=not set(needed_features) <= set(COUNTER_NAMES))
+
+
+# Function to count the messages of a run and save its message counts
+def count_run(folder_path, topology=False):
+    from FeatureCount import process_folder
+    counts_path = process_folder(folder_path, topology)
+    if counts_path is None:
+        print(f"No 'Packet Trace.csv' found in {folder_path}.")
+    return counts_path
+
+
+# Function to load the saved models to score with, all the ones in the models folder by default
+def load_models(models_path, model_names=None):
+    from ModelStore import load_scoring_model
+    if model_names is None:
+        model_names = sorted(os.path.splitext(name)[0] for name in os.listdir(models_path)
+                             if name.endswith(MODEL_EXTENSION)) if os.path.isdir(models_path) else []
+    models = {}
+    for model_name in model_names:
+        artifact = load_scoring_model(os.path.join(models_path, model_name + MODEL_EXTENSION))
+        if artifact is None:
+            print(f"No saved model {model_name} found in {models_path}, run DataClassifier.py first.")
+            continue
+        models[model_name] = artifact
+    return models
+
+
+# Function to save the predictions of every model, one row per sensor
+def save_predictions(file_path, sensor_ids, predictions):
+    with open(file_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Sensor_ID'] + list(predictions))
+        writer.writerows(zip(sensor_ids, *(labels.tolist() for labels in predictions.values())))
+
+
+# Function to score the sensors of a run with the saved models, counting its messages first when needed
+def score_run(folder_path, models_path, model_names=None):
+    models = load_models(models_path, model_names)
+    if not models:
+        print("No saved models to score with.")
+        return None
+    needed_features = {name for artifact in models.values() for name in artifact['feature_names']}
+    counts_path = ensure_counts(folder_path, needed_features)
+    if counts_path is None:
+        return None
+
+    # The run is normalized on its own, as every subfolder is by Normalize.py
+    from Normalize import normalize_blocks, read_message_counts
+    from ModelStore import predict_scoring
+    feature_names, sensor_ids, values = read_message_counts(counts_path)
+    normalize_blocks(values, [0])
+
+    predictions = {}
+    for model_name, artifact in models.items():
+        missing_features = [name for name in artifact['feature_names'] if name not in feature_names]
+        if missing_features:
+            print(f"Error: message counts are missing the features {missing_features} used by {model_name}.")
+            continue
+        # Score the features in the order the model was trained on
+        columns = [feature_names.index(name) for name in artifact['feature_names']]
+        predictions[model_name] = predict_scoring(artifact, values[:, columns])
+        flagged = [sensor for sensor, label in zip(sensor_ids, predictions[model_name].tolist())
+                   if LABEL_NAMES.get(label, label) == 'malicious']
+        print(f"{model_name}: {len(flagged)} of {len(sensor_ids)} sensors malicious"
+              + (f": {', '.join(flagged)}" if flagged else ""))
+
+    predictions_path = os.path.join(folder_path, PREDICTIONS_FILE_NAME)
+    save_predictions(predictions_path, sensor_ids, predictions)
+    print(f"Predictions saved to {predictions_path}")
+    return predictions_path
+
+
+# Function to parse the command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Count and score the sensors of one NetSim run.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    count_parser = commands.add_parser('count', help="count the messages of a run")
+    count_parser.add_argument('folder', help="folder of the run, with its 'Packet Trace.csv'")
+    count_parser.add_argument('--topology', action='store_true', help="append the DODAG topology features")
+    score_parser = commands.add_parser('score', help="score the sensors of a run, counting its messages if needed")
+    score_parser.add_argument('folder', help="folder of the run, with its 'Packet Trace.csv' or message counts")
+    score_parser.add_argument('--models', default=models_path, help="folder of the saved models")
+    score_parser.add_argument('--classifiers', nargs='+', help="saved models to score with, by file name "
+                                                               "without extension; all of them by default")
+    return parser.parse_args(argv)
+
+
+# Main function to run the command given on the command line
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'count':
+        output_path = count_run(args.folder, args.topology)
+        if output_path is not None:
+            print(f"Message counts saved to {output_path}")
+    else:
+        output_path = score_run(args.folder, args.models, args.classifiers)
+    return 0 if output_path is not None else 1
+
+
+# Run the command
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import numpy as np
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from DatasetIO import read_dataset, resolve_dataset
+import ScoringServer
+
+# Rows replayed against the server, one request per row as a post-processing hook would send them
+test_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Sample_data_files', 'test_data')
+
+# Clients sending requests at the same time, and how many times each replays the test data
+concurrency = 8
+repeat = 10
+
+# Classifier scored, None for the server's default
+classifier_name = None
+
+
+# Function to send a request to the server over an open connection and decode its JSON answer
+def request_json(connection, method, path, body=None):
+    payload = None if body is None else json.dumps(body).encode()
+    connection.request(method, path, payload, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+# Function to replay the rows from one client, recording the latency of every request
+def run_client(rows, latencies, errors):
+    connection = http.client.HTTPConnection(ScoringServer.host, ScoringServer.port)
+    try:
+        for _ in range(repeat):
+            for row in rows:
+                body = {'features': row} if classifier_name is None else {'features': row, 'classifier': classifier_name}
+                start = time.perf_counter()
+                status, answer = request_json(connection, 'POST', '/predict', body)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors.append(answer.get('error'))
+    finally:
+        connection.close()
+
+
+# Main function to load test the running scoring server and report its latency and throughput
+def main():
+    test_path = resolve_dataset(test_data_path)
+    if test_path is None:
+        print("Test data not found!")
+        return None
+    test_df = read_dataset(test_path)
+    rows = [row.to_dict() for _, row in test_df.drop(columns=['Label'], errors='ignore').iterrows()]
+
+    # Check the server is up and which classifiers it serves
+    connection = http.client.HTTPConnection(ScoringServer.host, ScoringServer.port)
+    _, health = request_json(connection, 'GET', '/health')
+    print(f"Server scores with {', '.join(health['classifiers'])}")
+
+    latencies, errors = [], []
+    clients = [threading.Thread(target=run_client, args=(rows, latencies, errors)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"{len(latencies)} requests from {concurrency} clients in {elapsed:.2f} s: "
+          f"{len(latencies) / elapsed:.0f} requests/s, p50 {np.percentile(latencies_ms, 50):.2f} ms, "
+          f"p99 {np.percentile(latencies_ms, 99):.2f} ms, {len(errors)} errors")
+    if errors:
+        print(f"First error: {errors[0]}")
+
+    # The server's own view, including how many requests it coalesced per predict call
+    _, stats = request_json(connection, 'GET', '/stats')
+    connection.close()
+    print(json.dumps(stats, indent=2))
+    return stats
+
+
+# Run the load test, optionally with the concurrency and repeat count given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        concurrency = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        repeat = int(sys.argv[2])
+    main()
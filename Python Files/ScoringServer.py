@@ -0,0 +1,220 @@
+import numpy as np
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from DataClassifier import CLASSIFIERS, classifiers, models_path
+from ModelStore import load_model, model_path
+
+# Address the server listens on, only reachable from this machine
+host = '127.0.0.1'
+port = 8765
+
+# Saved classifiers served, the first one scores requests that do not name one
+served_classifiers = classifiers
+
+# Most rows predicted in one call, and how long the first request of a batch waits for others to join it
+max_batch_rows = 1024
+max_batch_wait = 0.002
+
+# Latencies kept for the percentiles, the most recent requests only
+latency_window = 10000
+
+
+# Function to load the saved models once, with the feature order each was trained on
+def load_models(classifier_names):
+    models = {}
+    for classifier_name in classifier_names:
+        saved_model_path = model_path(models_path, CLASSIFIERS[classifier_name][2])
+        artifact = load_model(saved_model_path)
+        if artifact is None:
+            print(f"No saved {classifier_name} classifier found at {saved_model_path}, run DataClassifier.py first.")
+            continue
+        models[classifier_name] = artifact
+    return models
+
+
+# Function to start the batcher of a model: a thread coalescing the queued requests into one predict call
+def start_batcher(artifact, stats):
+    batcher = {'queue': queue.Queue(), 'model': artifact['model'], 'feature_names': artifact['feature_names'],
+               'stats': stats}
+    threading.Thread(target=run_batcher, args=(batcher,), daemon=True).start()
+    return batcher
+
+
+# Function to predict the queued requests in micro-batches, until the server stops
+def run_batcher(batcher):
+    requests = batcher['queue']
+    while True:
+        # Wait for a request, then for others to join it until the batch is full or the wait is over
+        batch = [requests.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + max_batch_wait
+        while rows < max_batch_rows:
+            try:
+                batch.append(requests.get(timeout=max(deadline - time.perf_counter(), 0)))
+            except queue.Empty:
+                break
+            rows += len(batch[-1][0])
+
+        try:
+            predictions = batcher['model'].predict(np.concatenate([X for X, _ in batch]))
+        except Exception:
+            # Score the requests one by one, so only the request the model cannot score fails
+            for X, future in batch:
+                try:
+                    future.set_result(batcher['model'].predict(X))
+                except Exception as e:
+                    future.set_exception(e)
+                record_batch(batcher['stats'], len(X))
+            continue
+
+        # Hand every request its own rows of the predictions
+        start = 0
+        for X, future in batch:
+            future.set_result(predictions[start:start + len(X)])
+            start += len(X)
+        record_batch(batcher['stats'], rows)
+
+
+# Function to score feature rows through a model's batcher, waiting for the batch they join
+def score_rows(batcher, rows):
+    feature_names = batcher['feature_names']
+    if not rows:
+        return np.array([])
+    # Rows are lists in the trained feature order, or dicts of feature values per name
+    try:
+        X = np.array([[row[name] for name in feature_names] if isinstance(row, dict) else row for row in rows],
+                     dtype=np.float64)
+    except ValueError:
+        X = None
+    # Bad rows are refused here, before they join the batch of other requests
+    if X is None or X.ndim != 2 or X.shape[1] != len(feature_names):
+        raise ValueError(f"Every row needs the {len(feature_names)} features {feature_names}")
+    if not np.isfinite(X).all():
+        raise ValueError("Features must be finite numbers, not NaN or infinity")
+    future = Future()
+    batcher['queue'].put((X, future))
+    return future.result()
+
+
+# Function to create the counters shared by all request threads
+def start_stats():
+    return {'lock': threading.Lock(), 'started': time.time(), 'requests': 0, 'rows': 0, 'errors': 0,
+            'batches': 0, 'batched_rows': 0, 'latencies': deque(maxlen=latency_window)}
+
+
+# Function to count one predict call of a batcher
+def record_batch(stats, rows):
+    with stats['lock']:
+        stats['batches'] += 1
+        stats['batched_rows'] += rows
+
+
+# Function to count one request and its latency
+def record_request(stats, rows, latency, error=False):
+    with stats['lock']:
+        stats['requests'] += 1
+        stats['rows'] += rows
+        stats['errors'] += int(error)
+        stats['latencies'].append(latency)
+
+
+# Function to report the counters: latency percentiles in ms, throughput and mean batch size
+def stats_report(stats):
+    with stats['lock']:
+        latencies = np.array(stats['latencies']) * 1000
+        uptime = time.time() - stats['started']
+        report = {'uptime_s': uptime, 'requests': stats['requests'], 'rows': stats['rows'],
+                  'errors': stats['errors'], 'batches': stats['batches'],
+                  'mean_batch_rows': stats['batched_rows'] / stats['batches'] if stats['batches'] else None,
+                  'requests_per_s': stats['requests'] / uptime, 'rows_per_s': stats['rows'] / uptime}
+    for name, percentile in (('p50_ms', 50), ('p99_ms', 99)):
+        report[name] = float(np.percentile(latencies, percentile)) if len(latencies) else None
+    return report
+
+
+# Function to create the HTTP server scoring requests with the batchers
+def make_server(batchers, stats, host, port):
+    default_classifier = next(iter(batchers))
+
+    # Handler of one HTTP request: POST /predict, GET /stats and GET /health
+    class ScoringHandler(BaseHTTPRequestHandler):
+        # Keep connections open between the requests of a client, and send small answers without delay
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def send_json(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self.send_json(200, stats_report(stats))
+            elif self.path == '/health':
+                self.send_json(200, {'classifiers': {name: batcher['feature_names'] for name, batcher in batchers.items()}})
+            else:
+                self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            if self.path != '/predict':
+                self.send_json(404, {'error': f'Unknown path {self.path}'})
+                return
+            rows = []
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                classifier_name = request.get('classifier', default_classifier)
+                if classifier_name not in batchers:
+                    raise ValueError(f"Classifier {classifier_name} is not served")
+                # One sensor's features, or the features of several sensors
+                rows = request['rows'] if 'rows' in request else [request['features']]
+                labels = score_rows(batchers[classifier_name], rows).tolist()
+            except Exception as e:
+                record_request(stats, len(rows), time.perf_counter() - start, error=True)
+                self.send_json(400, {'error': str(e)})
+                return
+            record_request(stats, len(rows), time.perf_counter() - start)
+            self.send_json(200, {'classifier': classifier_name, 'labels': labels})
+
+        # Do not log every request, the counters are in /stats
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), ScoringHandler)
+
+
+# Main function to serve the saved classifiers until interrupted
+def main(classifier_names=None):
+    classifier_names = served_classifiers if classifier_names is None else classifier_names
+    models = load_models(classifier_names)
+    if not models:
+        print("No saved classifiers to serve.")
+        return
+
+    stats = start_stats()
+    batchers = {classifier_name: start_batcher(artifact, stats) for classifier_name, artifact in models.items()}
+    server = make_server(batchers, stats, host, port)
+    print(f"Serving {', '.join(batchers)} on http://{host}:{port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(stats_report(stats)))
+
+
+# Run the server, optionally on the port given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        port = int(sys.argv[1])
+    main()
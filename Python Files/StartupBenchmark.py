@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Size of the synthetic run scored by the benchmark
+row_count = 100000
+sensor_count = 50
+malicious_count = 3
+
+# Times every command is run, the fastest run is reported
+repeats = 5
+
+# Most seconds a command may take from launch to exit, on the machine running the post-run hooks
+STARTUP_BUDGETS = {'help': 0.3, 'score': 1.5}
+
+# Modules the fast paths must not import, each costs from 0.3 s to over 2 s
+HEAVY_MODULES = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'joblib']
+
+# Classifiers trained for the benchmark, the ones with a numpy-only export
+SCORED_CLASSIFIERS = ["SVM", "Naive Bayes", "Logistic Regression"]
+
+# Script benchmarked, next to this one
+QUICK_PREDICT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'QuickPredict.py')
+
+
+# Function to generate a run with its message counts, and train and save the scored classifiers on it
+def prepare_run(temp_dir):
+    from TraceGenerator import write_trace
+    from DataClassifier import CLASSIFIERS
+    from ModelStore import model_fingerprint, model_path, save_model
+    from Normalize import normalize_blocks, read_message_counts
+    import QuickPredict
+
+    folder_path = os.path.join(temp_dir, 'run0')
+    print(f"Writing synthetic run with {row_count} rows and {sensor_count} sensors...")
+    malicious_sensors = write_trace(os.path.join(folder_path, 'Packet Trace.csv'), row_count, sensor_count,
+                                    malicious_count)
+    feature_names, sensor_ids, X = read_message_counts(QuickPredict.count_run(folder_path))
+    normalize_blocks(X, [0])
+    y = [int(sensor in malicious_sensors) for sensor in sensor_ids]
+
+    models_path = os.path.join(temp_dir, 'Models')
+    for classifier_name in SCORED_CLASSIFIERS:
+        estimator, params, output_file = CLASSIFIERS[classifier_name]
+        clf = estimator(**params).fit(X, y)
+        save_model(model_path(models_path, output_file), clf, model_fingerprint(X, y, estimator, params),
+                   feature_names)
+    return folder_path, models_path
+
+
+# Function to run a command the given number of times, returning the fastest wall time
+def fastest_run(command, cwd, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Function to run a command under 'python -X importtime', returning the cumulative microseconds of every
+# module it imported and of every top-level import
+def import_times(command, cwd):
+    result = subprocess.run([command[0], '-X', 'importtime'] + command[1:], cwd=cwd, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules, top_level = {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        # Nested imports are indented below the module importing them
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+    return modules, top_level
+
+
+# Function to benchmark a command: its wall time, slowest top-level imports and the heavy modules it loaded
+def benchmark_command(name, command, cwd):
+    wall = fastest_run(command, cwd, repeats)
+    modules, top_level = import_times(command, cwd)
+    heavy = sorted({module.split('.')[0] for module in modules} & set(HEAVY_MODULES))
+    print(f"\n{name}: {wall:.3f} s, {sum(top_level.values()) / 1e6:.3f} s importing")
+    for module, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:8]:
+        print(f"  {cumulative / 1e6:8.3f} s  {module}")
+    if heavy:
+        print(f"  heavy modules imported: {', '.join(heavy)}")
+    return wall, heavy
+
+
+# Main function to time the post-run commands against their budgets, and the scripts they replace
+def main():
+    python = sys.executable
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder_path, models_path = prepare_run(temp_dir)
+        commands = {
+            'help': [python, QUICK_PREDICT_PATH, '--help'],
+            'score': [python, QUICK_PREDICT_PATH, 'score', folder_path, '--models', models_path],
+            'import Predict': [python, '-c', 'import Predict'],
+        }
+
+        failures = []
+        for name, command in commands.items():
+            cwd = os.path.dirname(QUICK_PREDICT_PATH) if name == 'import Predict' else temp_dir
+            wall, heavy = benchmark_command(name, command, cwd)
+            if name not in STARTUP_BUDGETS:
+                continue
+            if wall > STARTUP_BUDGETS[name]:
+                failures.append(f"{name} took {wall:.3f} s, over its {STARTUP_BUDGETS[name]:.3f} s budget")
+            if heavy:
+                failures.append(f"{name} imported {', '.join(heavy)}")
+
+    print()
+    for failure in failures:
+        print(f"Error: {failure}")
+    if failures:
+        return 1
+    print("All commands within budget")
+    return 0
+
+
+# Run the benchmark, optionally with the row count given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        row_count = int(float(sys.argv[1]))
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import pandas as pd
+import io
+import json
+import os
+import threading
+import time
+from TraceReader import COUNTER_NAMES, TRACE_COLUMNS, count_chunk, finish_count, start_count
+from FeatureCount import build_sensor_counts
+from Normalize import normalize_message_counts
+from DataClassifier import CLASSIFIERS, models_path
+from ModelStore import load_model, model_path
+
+# Trace being written by the running simulation
+trace_path = "C:\\Users\\jace\\Documents\\Attack_detection_in_IoT\\Test-Samples\\Live\\Packet Trace.csv"
+
+# Saved classifier used to score the sensors (run DataClassifier.py first)
+classifier_name = "Logistic Regression"
+
+# Seconds between polls of the trace, and the most rows scored per poll; together they bound the detection latency
+poll_interval = 0.5
+max_batch_rows = 50000
+
+# Stop after this many seconds without new rows, None to follow the trace forever
+idle_timeout = None
+
+# Replay an existing trace into trace_path at replay_rate rows per second instead of waiting for a simulation
+replay_source = None
+replay_rate = 10000
+
+# Names of the predicted labels
+LABEL_NAMES = {0: 'benign', 1: 'malicious'}
+
+
+# Function to follow a growing trace, yielding the newly written complete rows as DataFrame chunks
+def follow_trace(file_path, poll_interval=0.5, max_batch_rows=50000, idle_timeout=None):
+    # Wait for the simulation to create the trace
+    last_activity = time.monotonic()
+    while not os.path.exists(file_path):
+        if idle_timeout is not None and time.monotonic() - last_activity > idle_timeout:
+            return
+        time.sleep(poll_interval)
+
+    dtypes = {column: 'category' for column in TRACE_COLUMNS}
+    with open(file_path, encoding='latin1', newline='') as file:
+        header = None
+        pending = ''
+        while True:
+            # A trace shorter than what was read means the simulation restarted, start over
+            if os.path.getsize(file_path) < file.tell():
+                file.seek(0)
+                header = None
+                pending = ''
+                yield None
+
+            # Collect the complete lines written since the last poll, a partial last line waits for the next one
+            lines = []
+            while len(lines) < max_batch_rows:
+                line = file.readline()
+                if not line:
+                    break
+                pending += line
+                if not pending.endswith('\n'):
+                    continue
+                if header is None:
+                    header = pending
+                    header_columns = pd.read_csv(io.StringIO(header), nrows=0).columns
+                    missing_columns = [column for column in TRACE_COLUMNS if column not in header_columns]
+                    if missing_columns:
+                        raise ValueError(f"Required columns are missing in {file_path}: {missing_columns}")
+                else:
+                    lines.append(pending)
+                pending = ''
+
+            if lines:
+                last_activity = time.monotonic()
+                yield pd.read_csv(io.StringIO(header + ''.join(lines)), usecols=TRACE_COLUMNS, dtype=dtypes)
+                # Keep reading straight away while the trace is ahead of us
+                if len(lines) == max_batch_rows:
+                    continue
+            elif idle_timeout is not None and time.monotonic() - last_activity > idle_timeout:
+                return
+
+            time.sleep(poll_interval)
+
+
+# Function to compute the normalized features of every sensor from the counters seen so far
+def sensor_features(trace_counts, feature_names):
+    all_counts = build_sensor_counts(trace_counts)
+    if all_counts.empty:
+        return pd.DataFrame(columns=feature_names, dtype=float)
+    # Same row-max normalization as Normalize.py, one row per sensor, in the order the model was trained on
+    return normalize_message_counts(all_counts)[feature_names]
+
+
+# Function to print a detection event as one JSON line
+def print_event(event):
+    print(json.dumps(event), flush=True)
+
+
+# Function to score the sensors of a growing trace, emitting an event whenever a sensor's label changes
+def run_detector(trace_path, classifier_name, poll_interval=0.5, max_batch_rows=50000, idle_timeout=None,
+                 on_event=print_event):
+    # Load the classifier saved by DataClassifier.py
+    saved_model_path = model_path(models_path, CLASSIFIERS[classifier_name][2])
+    artifact = load_model(saved_model_path)
+    if artifact is None:
+        print(f"No saved {classifier_name} classifier found at {saved_model_path}, run DataClassifier.py first.")
+        return None
+    model, feature_names = artifact['model'], artifact['feature_names']
+    # Only the message counters are computed from the live trace, a model trained on other features cannot be scored
+    missing_features = [name for name in feature_names if name not in COUNTER_NAMES]
+    if missing_features:
+        print(f"Error: live message counts are missing the features {missing_features} used by {classifier_name}.")
+        return None
+
+    state = start_count()
+    scored_features = pd.DataFrame(columns=feature_names, dtype=float)
+    labels = {}
+    trace_rows = 0
+
+    for chunk in follow_trace(trace_path, poll_interval, max_batch_rows, idle_timeout):
+        if chunk is None:
+            # The trace restarted, forget everything counted so far
+            state = start_count()
+            scored_features = pd.DataFrame(columns=feature_names, dtype=float)
+            labels = {}
+            trace_rows = 0
+            continue
+        read_time = time.monotonic()
+
+        # Update the counters with the new rows only
+        count_chunk(state, chunk)
+        trace_rows += len(chunk)
+        features = sensor_features(finish_count(state), feature_names)
+
+        # Re-score only the sensors whose normalized features changed
+        previous = scored_features.reindex(features.index)
+        changed = features.ne(previous).any(axis=1)
+        if changed.any():
+            changed_features = features[changed]
+            predictions = model.predict(changed_features.to_numpy(dtype=float))
+            latency_ms = (time.monotonic() - read_time) * 1000
+            for sensor, prediction in zip(changed_features.index, predictions):
+                # Models trained on string labels predict the label names themselves
+                label = LABEL_NAMES.get(prediction, str(prediction))
+                if labels.get(sensor) != label:
+                    labels[sensor] = label
+                    on_event({
+                        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'sensor': sensor,
+                        'label': label,
+                        'rows': trace_rows,
+                        'latency_ms': round(latency_ms, 1),
+                        'features': changed_features.loc[sensor].to_dict()
+                    })
+        scored_features = features
+
+    return labels
+
+
+# Function to replay a finished trace into a new file at a controlled rate, to test the detector
+def replay_trace(source_path, target_path, rows_per_second, batch_rows=1000):
+    with open(source_path, encoding='latin1', newline='') as source, \
+            open(target_path, 'w', encoding='latin1', newline='') as target:
+        target.write(source.readline())
+        target.flush()
+
+        start = time.monotonic()
+        written = 0
+        batch = []
+        for line in source:
+            batch.append(line)
+            if len(batch) < batch_rows:
+                continue
+            target.write(''.join(batch))
+            target.flush()
+            written += len(batch)
+            batch = []
+            # Wait until the rows written so far are due at the requested rate
+            delay = start + written / rows_per_second - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        target.write(''.join(batch))
+        target.flush()
+
+
+# Main function to run the detector on the live trace, or on a replayed one
+def main():
+    timeout = idle_timeout
+    if replay_source is not None:
+        replay = threading.Thread(target=replay_trace, args=(replay_source, trace_path, replay_rate), daemon=True)
+        replay.start()
+        # Stop once the replay has finished and the last rows were scored
+        timeout = idle_timeout if idle_timeout is not None else max(2.0, 4 * poll_interval)
+
+    labels = run_detector(trace_path, classifier_name, poll_interval, max_batch_rows, timeout)
+    if labels is not None:
+        malicious = [sensor for sensor, label in labels.items() if label == LABEL_NAMES[1]]
+        print(f"Sensors classified malicious: {malicious}")
+
+
+# Run the main function
+if __name__ == "__main__":
+    main()
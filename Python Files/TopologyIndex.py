@@ -0,0 +1,133 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from NodeRegistry import SINK, intern_nodes
+from Profiler import profile_chunks, profile_step
+from TraceReader import TRACE_CHUNKSIZE, category_positions, count_chunk, finish_count, read_trace_chunks, start_count
+
+# Control packets whose SOURCE_ID -> RECEIVER_ID rows are the edges of the DODAG
+EDGE_PACKETS = ['DAO', 'DIO']
+
+# Features computed from the topology, appended after the message counters
+TOPOLOGY_FEATURES = ['In_Degree', 'Out_Degree', 'Rank_Depth', 'Neighbor_DAO_Ratio', 'Sink_Fan_In']
+
+# Topology features that count nodes or levels, written as integers
+INTEGER_FEATURES = ['In_Degree', 'Out_Degree', 'Rank_Depth', 'Sink_Fan_In']
+
+
+# Function to start collecting the edges of a trace, the returned state is updated chunk by chunk
+def start_topology(registry):
+    # Per packet type, the distinct (source, receiver) edges of every chunk with their counts
+    return {'registry': registry, 'edges': {packet: [] for packet in EDGE_PACKETS}}
+
+
+# Function to add the DAO and DIO edges of one chunk of trace rows to the state
+def add_edges(topology, chunk):
+    source_codes = intern_nodes(topology['registry'], chunk['SOURCE_ID'])
+    receiver_codes = intern_nodes(topology['registry'], chunk['RECEIVER_ID'])
+    successful = category_positions(chunk['PACKET_STATUS'], ['Successful']) == 0
+    control = category_positions(chunk['PACKET_TYPE'], ['Control_Packet']) == 0
+    packet = category_positions(chunk['CONTROL_PACKET_TYPE/APP_NAME'], EDGE_PACKETS)
+    packet = np.where(successful & control & (source_codes >= 0) & (receiver_codes >= 0), packet, -1)
+
+    # Each chunk is reduced to its distinct edges, so the state grows with the topology, not the trace;
+    # an edge is keyed by its source code in the high and its receiver code in the low 32 bits
+    keys = (source_codes.astype(np.int64) << 32) | receiver_codes
+    for index, name in enumerate(EDGE_PACKETS):
+        topology['edges'][name].append(np.unique(keys[packet == index], return_counts=True))
+
+
+# Function to build the sparse adjacency matrix of one packet type, one row and column per node label,
+# each entry the number of packets the row node sent to the column node
+def adjacency_matrix(edges, label_ids, node_count):
+    keys = np.concatenate([keys for keys, _ in edges]) if edges else np.zeros(0, dtype=np.int64)
+    counts = np.concatenate([counts for _, counts in edges]) if edges else np.zeros(0, dtype=np.int64)
+    # Duplicate edges of different chunks are summed when converting to CSR
+    return sparse.coo_matrix((counts, (label_ids[keys >> 32], label_ids[keys & 0xFFFFFFFF])),
+                             shape=(node_count, node_count)).tocsr()
+
+
+# Function to pick the preferred parent of every node: the node it sent the most DAO messages to, -1 without
+def preferred_parents(dao):
+    parents = np.full(dao.shape[0], -1)
+    coo = dao.tocoo()
+    # The first entry of each row after sorting by decreasing count, ties to the lowest column
+    order = np.lexsort((coo.col, -coo.data, coo.row))
+    rows, first = np.unique(coo.row[order], return_index=True)
+    parents[rows] = coo.col[order][first]
+    return parents
+
+
+# Function to compute the depth of every node below the sinks following the preferred parents, level
+# by level, and how many nodes route to a sink through each; 0 depth for nodes not attached to a sink
+def rank_depths(parents, sinks):
+    depths = np.zeros(len(parents), dtype=np.int64)
+    attached = np.zeros(len(parents), dtype=bool)
+    attached[sinks] = True
+    levels = []
+    frontier = attached.copy()
+    while True:
+        # Children of the last level that are not attached yet, loops never reach a sink
+        children = ~attached & (parents >= 0)
+        children[children] = frontier[parents[children]]
+        if not children.any():
+            break
+        depths[children] = len(levels) + 1
+        attached |= children
+        levels.append(np.flatnonzero(children))
+        frontier = children
+
+    # Deepest level first, every node hands its own route and the routes through it to its parent
+    fan_in = np.zeros(len(parents), dtype=np.int64)
+    for level in reversed(levels):
+        np.add.at(fan_in, parents[level], fan_in[level] + 1)
+    return depths, fan_in
+
+
+# Function to compute the topology features of every node label of a trace
+def finish_topology(topology):
+    registry = topology['registry']
+    # Node codes sharing a label are one node, as in the message counts
+    labels, label_ids = np.unique(np.array(registry['labels'], dtype=object), return_inverse=True)
+    node_count = len(labels)
+    label_kinds = np.zeros(node_count, dtype=np.int8)
+    label_kinds[label_ids] = registry['kinds']
+
+    with profile_step('topology', rows=node_count):
+        dao = adjacency_matrix(topology['edges']['DAO'], label_ids, node_count)
+        dio = adjacency_matrix(topology['edges']['DIO'], label_ids, node_count)
+
+        # Distinct nodes each node heard from and was heard by
+        linked = ((dao + dio) > 0).astype(np.int64)
+        in_degree = np.asarray(linked.sum(axis=0)).ravel()
+        out_degree = np.asarray(linked.sum(axis=1)).ravel()
+
+        # Share of a node's DAO traffic that it received, averaged over the nodes it exchanges messages with
+        dao_sent = np.asarray(dao.sum(axis=1)).ravel()
+        dao_received = np.asarray(dao.sum(axis=0)).ravel()
+        dao_total = dao_sent + dao_received
+        dao_ratio = np.divide(dao_received, dao_total, out=np.zeros(node_count), where=dao_total > 0)
+        neighbors = ((linked + linked.T) > 0).astype(np.float64)
+        neighbor_count = np.asarray(neighbors.sum(axis=1)).ravel()
+        neighbor_ratio = np.divide(neighbors @ dao_ratio, neighbor_count, out=np.zeros(node_count),
+                                   where=neighbor_count > 0)
+
+        depths, fan_in = rank_depths(preferred_parents(dao), np.flatnonzero(label_kinds == SINK))
+
+    return pd.DataFrame({'In_Degree': in_degree, 'Out_Degree': out_degree, 'Rank_Depth': depths,
+                         'Neighbor_DAO_Ratio': neighbor_ratio, 'Sink_Fan_In': fan_in},
+                        index=pd.Index(labels.tolist()), columns=TOPOLOGY_FEATURES)
+
+
+# Function to compute the counters and the topology features of a trace in a single pass
+def count_trace_topology(file_path, chunksize=TRACE_CHUNKSIZE, use_cache=True):
+    state = start_count()
+    topology = start_topology(state['registry'])
+    for chunk in profile_chunks('trace load', read_trace_chunks(file_path, chunksize, use_cache)):
+        with profile_step('count', rows=len(chunk)):
+            count_chunk(state, chunk)
+        with profile_step('topology edges', rows=len(chunk)):
+            add_edges(topology, chunk)
+    with profile_step('count'):
+        trace_counts = finish_count(state)
+    return trace_counts, finish_topology(topology)
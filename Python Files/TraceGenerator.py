@@ -0,0 +1,172 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# pyarrow is optional, it writes the CSV text much faster than pandas
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# Folder the generated runs are written to, one subfolder per run like a NetSim experiment
+base_path = os.path.join(os.getcwd(), 'Synthetic-Samples')
+
+# Size and make-up of each generated run
+run_count = 4
+row_count = 1000000
+sensor_count = 50
+malicious_count = 3
+
+# Share of control packets among all rows, the rest are Sensing packets
+control_share = 0.6
+
+# Mix of the control packet types
+control_mix = {'DIO': 0.45, 'DAO': 0.35, 'DIS': 0.1, 'DAO-ACK': 0.1}
+
+# Mix of the packet statuses
+status_mix = {'Successful': 0.85, 'Errored': 0.1, 'Collided': 0.05}
+
+# Share of the other sensors that pick a malicious node as their parent, and how many
+# more DIO messages a malicious node sends than an honest one
+victim_share = 0.3
+malicious_dio_rate = 4.0
+
+# Rows generated and written at a time, bounds the memory used for large traces
+chunk_rows = 1000000
+
+# Name of the file with the true label of every sensor of a run, 1 for malicious
+LABELS_FILE_NAME = 'Sensor_Labels.csv'
+
+# Columns of the generated 'Packet Trace.csv', a subset of the columns NetSim writes
+TRACE_HEADER = ['PACKET_ID', 'SEGMENT_ID', 'PACKET_TYPE', 'CONTROL_PACKET_TYPE/APP_NAME', 'SOURCE_ID',
+                'DESTINATION_ID', 'TRANSMITTER_ID', 'RECEIVER_ID', 'APP_LAYER_ARRIVAL_TIME(US)',
+                'PHY_LAYER_ARRIVAL_TIME(US)', 'PHY_LAYER_PAYLOAD(Bytes)', 'PACKET_STATUS']
+
+# Payload sizes of the packet types, in bytes
+PAYLOAD_BYTES = {'DIO': 76, 'DAO': 52, 'DIS': 18, 'DAO-ACK': 20, 'Sensing': 50}
+
+
+# Function to pick the malicious sensors of a run and the parent every sensor sends its DAO and data to
+def build_topology(rng, sensor_count, malicious_count, victim_share):
+    sink = sensor_count
+    malicious = np.sort(rng.choice(sensor_count, min(malicious_count, sensor_count), replace=False))
+
+    # Honest sensors report to the sink, unless a malicious node lured them with its DIO messages
+    parents = np.full(sensor_count, sink)
+    if len(malicious):
+        honest = np.setdiff1d(np.arange(sensor_count), malicious)
+        victims = honest[rng.random(len(honest)) < victim_share]
+        parents[victims] = rng.choice(malicious, len(victims))
+    return malicious, parents
+
+
+# Function to generate one chunk of trace rows as node and packet codes
+def generate_chunk(rng, rows, start_time, sensor_count, malicious, parents):
+    sink = sensor_count
+    packet_kinds = list(control_mix) + ['Sensing']
+    kind_shares = [control_share * share / sum(control_mix.values()) for share in control_mix.values()]
+    kinds = rng.choice(len(packet_kinds), rows, p=kind_shares + [1 - control_share])
+    kind_names = np.array(packet_kinds)[kinds]
+
+    # Any sensor, malicious ones sending DIO messages more often
+    dio_weights = np.ones(sensor_count + 1)
+    dio_weights[malicious] = malicious_dio_rate
+    sources = rng.integers(0, sensor_count, rows)
+    dio = kind_names == 'DIO'
+    sources[dio] = rng.choice(sensor_count + 1, np.count_nonzero(dio), p=dio_weights / dio_weights.sum())
+
+    # DIO and DIS messages reach a neighbour, DAO messages and data go to the parent, DAO-ACKs come back from it
+    receivers = rng.integers(0, sensor_count, rows)
+    to_parent = (kind_names == 'DAO') | (kind_names == 'Sensing')
+    receivers[to_parent] = parents[sources[to_parent]]
+    dao_ack = kind_names == 'DAO-ACK'
+    receivers[dao_ack] = sources[dao_ack]
+    sources[dao_ack] = parents[sources[dao_ack]]
+
+    # Some data is forwarded by a neighbouring sensor on the way to the sink
+    forwarded = (kind_names == 'Sensing') & (receivers == sink) & (rng.random(rows) < 0.2)
+    receivers[forwarded] = rng.integers(0, sensor_count, np.count_nonzero(forwarded))
+
+    statuses = rng.choice(list(status_mix), rows, p=np.array(list(status_mix.values())) / sum(status_mix.values()))
+    arrival_times = start_time + np.cumsum(rng.exponential(100.0, rows)).round(2)
+    return kind_names, sources, receivers, statuses, arrival_times
+
+
+# Function to write a synthetic 'Packet Trace.csv' in chunks, returning the IDs of its malicious sensors
+def write_trace(file_path, row_count, sensor_count, malicious_count, seed=42):
+    rng = np.random.default_rng(seed)
+    malicious, parents = build_topology(rng, sensor_count, malicious_count, victim_share)
+    node_names = np.array([f'SENSOR-{i}' for i in range(1, sensor_count + 1)] + [f'SINKNODE-{sensor_count + 1}'])
+    payloads = pd.Series(PAYLOAD_BYTES)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as file:
+        file.write((','.join(TRACE_HEADER) + '\n').encode('latin1'))
+        start_time = 0.0
+        for first_row in range(0, row_count, chunk_rows):
+            rows = min(chunk_rows, row_count - first_row)
+            kind_names, sources, receivers, statuses, arrival_times = generate_chunk(
+                rng, rows, start_time, sensor_count, malicious, parents)
+            start_time = arrival_times[-1]
+
+            sensing = kind_names == 'Sensing'
+            destinations = np.where(sensing, node_names[sensor_count], node_names[receivers])
+            destinations[kind_names == 'DIO'] = 'Broadcast-0'
+            chunk = pd.DataFrame({
+                'PACKET_ID': np.arange(first_row + 1, first_row + rows + 1),
+                'SEGMENT_ID': 0,
+                'PACKET_TYPE': np.where(sensing, 'Sensing', 'Control_Packet'),
+                'CONTROL_PACKET_TYPE/APP_NAME': np.where(sensing, 'App1_SENSOR_APP', kind_names),
+                'SOURCE_ID': node_names[sources],
+                'DESTINATION_ID': destinations,
+                'TRANSMITTER_ID': node_names[sources],
+                'RECEIVER_ID': node_names[receivers],
+                'APP_LAYER_ARRIVAL_TIME(US)': arrival_times,
+                'PHY_LAYER_ARRIVAL_TIME(US)': arrival_times + 5.0,
+                'PHY_LAYER_PAYLOAD(Bytes)': payloads.reindex(kind_names).to_numpy(),
+                'PACKET_STATUS': statuses,
+            }, columns=TRACE_HEADER)
+
+            # The header was written above, the values need no quoting
+            if pa_csv is not None:
+                pa_csv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), file,
+                                 pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+            else:
+                chunk.to_csv(file, header=False, index=False, encoding='latin1')
+
+    return [f'S-{sensor + 1}' for sensor in malicious]
+
+
+# Function to write the true label of every sensor of a run next to its trace
+def write_labels(folder_path, sensor_count, malicious_sensors):
+    sensors = [f'S-{i}' for i in range(1, sensor_count + 1)]
+    labels = pd.DataFrame({'Label': [int(sensor in malicious_sensors) for sensor in sensors]}, index=sensors)
+    labels.index.name = 'Sensor_ID'
+    labels.to_csv(os.path.join(folder_path, LABELS_FILE_NAME))
+
+
+# Function to generate a folder of runs, each with a trace and the labels of its sensors
+def generate_runs(base_path, run_count, row_count, sensor_count, malicious_count, seed=42):
+    folder_paths = []
+    for run in range(run_count):
+        folder_path = os.path.join(base_path, f'run{run}')
+        malicious_sensors = write_trace(os.path.join(folder_path, 'Packet Trace.csv'), row_count, sensor_count,
+                                        malicious_count, seed + run)
+        write_labels(folder_path, sensor_count, malicious_sensors)
+        print(f"Generated {folder_path} with malicious sensors {malicious_sensors}")
+        folder_paths.append(folder_path)
+    return folder_paths
+
+
+# Generate the runs, optionally with the run count, row count and sensor count given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        row_count = int(float(sys.argv[2]))
+    if len(sys.argv) > 3:
+        sensor_count = int(sys.argv[3])
+    generate_runs(base_path, run_count, row_count, sensor_count, malicious_count)
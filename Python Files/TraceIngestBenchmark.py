@@ -0,0 +1,104 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from FeatureCount import build_sensor_counts
+from TraceGenerator import write_trace
+from TraceReader import TRACE_COMPRESSIONS, TRACE_FILE_NAME, count_trace
+
+# Size of the synthetic trace used for the benchmark
+row_count = 2000000
+sensor_count = 50
+malicious_count = 3
+
+# Level each compression is written at, the level NetSim archives are usually made with
+COMPRESSION_LEVELS = {'.gz': 6, '.zst': 3, '.xz': 1}
+
+
+# Function to write a compressed copy of a trace
+def compress_trace(file_path, compression):
+    compressed_path = file_path + compression
+    opener = TRACE_COMPRESSIONS[compression]
+    level = COMPRESSION_LEVELS[compression]
+    with open(file_path, 'rb') as source:
+        if compression == '.zst':
+            # All cores compress, reading is what is benchmarked
+            import zstandard
+            with open(compressed_path, 'wb') as target:
+                zstandard.ZstdCompressor(level=level, threads=-1).copy_stream(source, target)
+        elif compression == '.xz':
+            with opener(compressed_path, 'wb', preset=level) as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+        else:
+            with opener(compressed_path, 'wb', compresslevel=level) as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+    return compressed_path
+
+
+# Function to decompress a trace to disk first, the way compressed traces had to be read before
+def decompress_to_disk(compressed_path, temp_dir):
+    file_path = os.path.join(temp_dir, 'decompressed', TRACE_FILE_NAME)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with TRACE_COMPRESSIONS[os.path.splitext(compressed_path)[1]](compressed_path, 'rb') as source, \
+            open(file_path, 'wb') as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    return file_path
+
+
+# Function to count a trace without its columnar cache, returning the message counts as CSV text
+def counts_text(file_path):
+    return build_sensor_counts(count_trace(file_path, use_cache=False)).to_csv()
+
+
+# Function to time a call, returning its result and the elapsed seconds
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+# Main function to compare reading the compressed traces directly with reading the plain CSV
+def main(row_count, sensor_count):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, TRACE_FILE_NAME)
+        print(f"Writing synthetic trace with {row_count} rows and {sensor_count} sensors...")
+        write_trace(file_path, row_count, sensor_count, malicious_count)
+        csv_mb = os.path.getsize(file_path) / 2**20
+
+        plain_counts, plain_time = timed(counts_text, file_path)
+        print(f"{'Plain CSV':<24}{csv_mb:>10.1f} MB{plain_time:>9.2f} s{csv_mb / plain_time:>9.1f} MB/s")
+
+        for compression, opener in TRACE_COMPRESSIONS.items():
+            if opener is None:
+                print(f"{compression}: zstandard is not installed, skipping.")
+                continue
+            compressed_path = compress_trace(file_path, compression)
+            compressed_mb = os.path.getsize(compressed_path) / 2**20
+
+            # Reading the compressed trace directly, then decompressing it to disk and reading the copy
+            direct_counts, direct_time = timed(counts_text, compressed_path)
+            disk_path, disk_time = timed(decompress_to_disk, compressed_path, temp_dir)
+            disk_counts, read_time = timed(counts_text, disk_path)
+            disk_time += read_time
+            os.remove(disk_path)
+            os.remove(compressed_path)
+
+            if direct_counts != plain_counts or disk_counts != plain_counts:
+                print(f"Error: counts of the {compression} trace differ from the plain CSV counts.")
+                return 1
+            print(f"{'Direct ' + compression:<24}{compressed_mb:>10.1f} MB{direct_time:>9.2f} s"
+                  f"{csv_mb / direct_time:>9.1f} MB/s, {direct_time / plain_time:.2f}x the plain read")
+            print(f"{'To disk, then read':<24}{'':>13}{disk_time:>9.2f} s{csv_mb / disk_time:>9.1f} MB/s")
+
+        print("Outputs identical")
+    return 0
+
+
+# Run the benchmark, optionally with the row and sensor counts given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        row_count = int(float(sys.argv[1]))
+    if len(sys.argv) > 2:
+        sensor_count = int(sys.argv[2])
+    sys.exit(main(row_count, sensor_count))
@@ -0,0 +1,396 @@
+import pandas as pd
+import numpy as np
+import gzip
+import io
+import json
+import lzma
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from NodeRegistry import OTHER, SENSOR, default_registry, intern_nodes, node_kinds, node_labels
+from Profiler import profile_chunks, profile_step
+
+# pyarrow is optional, without it traces are always parsed from the CSV text
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# zstandard is optional, without it only gzip and xz compressed traces can be read
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Name of the packet trace NetSim writes to every experiment folder
+TRACE_FILE_NAME = 'Packet Trace.csv'
+
+# Compressed traces read directly, by extension after '.csv', with the function opening each
+TRACE_COMPRESSIONS = {
+    '.gz': gzip.open,
+    '.zst': zstandard.open if zstandard is not None else None,
+    '.xz': lzma.open,
+}
+
+# Size of the decompressed blocks handed to the parser, and how many may wait in the queue; the
+# decompressor thread runs ahead of the parser by at most their product
+DECOMPRESS_BLOCK_SIZE = 1 << 20
+DECOMPRESS_QUEUE_BLOCKS = 8
+
+# Columns of 'Packet Trace.csv' needed to compute the DAO/DIO/Sensing counters
+TRACE_COLUMNS = ['PACKET_TYPE', 'CONTROL_PACKET_TYPE/APP_NAME', 'SOURCE_ID', 'RECEIVER_ID', 'PACKET_STATUS']
+
+# Number of trace rows parsed at a time, keeps memory flat for any trace length
+TRACE_CHUNKSIZE = 500000
+
+# Names of the counters computed from a trace
+COUNTER_NAMES = ['DAO_Sent', 'DAO_Received', 'DIO_Sent', 'DIO_Received', 'Packet_Received']
+
+# Extension of the columnar cache stored next to each 'Packet Trace.csv'
+TRACE_CACHE_EXTENSION = '.parquet'
+
+# Key of the Parquet metadata recording which CSV the cache was built from
+TRACE_CACHE_METADATA_KEY = b'trace_source'
+
+# Receivers excluded from the list of sensors present in the Sensing data
+EXCLUDED_SENSING_NODES = ['SinkNode', 'Router', 'Node']
+
+
+# Function to get the compression of a trace from its extension, None for a plain CSV
+def trace_compression(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension if extension in TRACE_COMPRESSIONS else None
+
+
+# Function to decompress a trace on a background thread into a bounded queue of blocks, so the
+# decompression of the next blocks overlaps the parsing of the current one; the codecs release the GIL
+def start_decompressor(file_path, opener):
+    blocks = queue.Queue(maxsize=DECOMPRESS_QUEUE_BLOCKS)
+    stop = threading.Event()
+
+    # Function to queue a block, giving up once the reader stopped consuming
+    def put(block):
+        while not stop.is_set():
+            try:
+                blocks.put(block, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    # Function to decompress the whole file, an empty block marks its end and an error is passed on as is
+    def decompress():
+        try:
+            with opener(file_path, 'rb') as source:
+                while True:
+                    block = source.read(DECOMPRESS_BLOCK_SIZE)
+                    if not put(block) or not block:
+                        return
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=decompress, daemon=True).start()
+    return blocks, stop
+
+
+# Binary stream over the blocks of a decompressor thread, read by the CSV parser like a file
+class DecompressedStream(io.RawIOBase):
+    def __init__(self, blocks, stop):
+        self.blocks = blocks
+        self.stop = stop
+        self.pending = memoryview(b'')
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            if self.finished:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.finished = True
+                return 0
+            self.pending = memoryview(block)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    # Stop the decompressor when the parser is done, even before the end of the file
+    def close(self):
+        self.stop.set()
+        super().close()
+
+
+# Function to open a trace for the CSV parser: the path of a plain CSV, or a stream decompressed
+# on a background thread for a compressed one
+@contextmanager
+def open_trace(file_path):
+    compression = trace_compression(file_path)
+    if compression is None:
+        yield file_path
+        return
+    opener = TRACE_COMPRESSIONS[compression]
+    if opener is None:
+        raise ImportError(f"zstandard is required to read {file_path}")
+    with io.BufferedReader(DecompressedStream(*start_decompressor(file_path, opener)),
+                           buffer_size=DECOMPRESS_BLOCK_SIZE) as stream:
+        yield stream
+
+
+# Function to read the column names of a trace, only decompressing its first block
+def trace_header_columns(file_path):
+    with open_trace(file_path) as source:
+        return pd.read_csv(source, encoding='latin1', nrows=0).columns
+
+
+# Function to read the header of a trace and report the required columns it lacks
+def missing_trace_columns(file_path):
+    header_columns = trace_header_columns(file_path)
+    return [column for column in TRACE_COLUMNS if column not in header_columns]
+
+
+# Function to iterate over the CSV text of a trace in chunks, loading only the required columns
+def read_csv_chunks(file_path, chunksize=TRACE_CHUNKSIZE):
+    missing_columns = missing_trace_columns(file_path)
+    if missing_columns:
+        raise ValueError(f"Required columns are missing in {file_path}: {missing_columns}")
+
+    # Categorical dtypes store each packet type, status and node ID once per chunk
+    dtypes = {column: 'category' for column in TRACE_COLUMNS}
+    with open_trace(file_path) as source:
+        reader = pd.read_csv(source, encoding='latin1', usecols=TRACE_COLUMNS, dtype=dtypes, chunksize=chunksize)
+        with reader:
+            for chunk in reader:
+                yield chunk[TRACE_COLUMNS]
+
+
+# Function to get the path of the columnar cache of a trace, the same for a trace and its compressed copies
+def trace_cache_path(file_path):
+    if trace_compression(file_path) is not None:
+        file_path = os.path.splitext(file_path)[0]
+    return os.path.splitext(file_path)[0] + TRACE_CACHE_EXTENSION
+
+
+# Function to describe the CSV a cache is built from, any change to it invalidates the cache
+def trace_source_signature(file_path):
+    stat = os.stat(file_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+# Function to check whether the cache of a trace is still valid for its CSV
+def trace_cache_is_fresh(file_path, cache_path):
+    if not os.path.exists(cache_path):
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+        source = json.loads(metadata[TRACE_CACHE_METADATA_KEY])
+    except Exception:
+        # Unreadable or foreign file, rebuild it
+        return False
+    return source == trace_source_signature(file_path)
+
+
+# Function to parse the CSV of a trace in chunks while writing them to its columnar cache
+def cache_csv_chunks(file_path, cache_path, chunksize=TRACE_CHUNKSIZE):
+    signature = trace_source_signature(file_path)
+
+    # Dictionary-encoded string columns, so every node ID is stored once per row group
+    schema = pa.schema([(column, pa.dictionary(pa.int32(), pa.string())) for column in TRACE_COLUMNS])
+    schema = schema.with_metadata({TRACE_CACHE_METADATA_KEY: json.dumps(signature)})
+
+    # Write to a temporary file so an interrupted run never leaves a truncated cache behind
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    writer = pq.ParquetWriter(temp_path, schema, compression='zstd')
+    completed = False
+    try:
+        for chunk in read_csv_chunks(file_path, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield chunk
+        completed = True
+    finally:
+        writer.close()
+        if completed:
+            os.replace(temp_path, cache_path)
+        else:
+            os.remove(temp_path)
+
+
+# Function to iterate over the columnar cache of a trace in chunks
+def read_cached_chunks(cache_path, chunksize=TRACE_CHUNKSIZE):
+    # Memory-mapped reads decode the cached columns without copying the file into memory
+    parquet_file = pq.ParquetFile(cache_path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=TRACE_COLUMNS):
+        # Dictionary columns come back as categoricals
+        yield batch.to_pandas()
+
+
+# Function to iterate over a trace in chunks, through its columnar cache when pyarrow is available
+def read_trace_chunks(file_path, chunksize=TRACE_CHUNKSIZE, use_cache=True):
+    if not use_cache or pq is None:
+        yield from read_csv_chunks(file_path, chunksize)
+        return
+
+    cache_path = trace_cache_path(file_path)
+    if trace_cache_is_fresh(file_path, cache_path):
+        yield from read_cached_chunks(cache_path, chunksize)
+    else:
+        # Build or rebuild the cache during this pass over the CSV
+        yield from cache_csv_chunks(file_path, cache_path, chunksize)
+
+
+# Function to map every row of a categorical column to the position of its value in a list, -1 if absent
+def category_positions(column, values):
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype('category')
+    # Look each category up once, the trailing -1 catches missing values (code -1)
+    lookup = np.array([values.index(category) if category in values else -1
+                       for category in column.cat.categories] + [-1])
+    return lookup[column.cat.codes.to_numpy()]
+
+
+# Function to turn the ordered counts of a counter into the Series value_counts() would have produced
+def counter_to_series(counter):
+    series = pd.Series(counter, dtype='int64')
+    # Most frequent first, ties in order of first appearance
+    order = np.argsort(-series.to_numpy(), kind='stable')
+    return series.iloc[order]
+
+
+# Rows of the count table after the counters: nodes seen as Sensing sources and receivers
+SENSING_SOURCES = len(COUNTER_NAMES)
+SENSING_RECEIVERS = SENSING_SOURCES + 1
+
+
+# Function to start counting a trace, the returned state is updated chunk by chunk
+def start_count(registry=None):
+    return {
+        # Node IDs interned into integer codes, with their labels and kinds, shared with the other traces
+        'registry': default_registry if registry is None else registry,
+        # One row per counter, followed by the Sensing sources and receivers, one column per node
+        'counts': np.zeros((SENSING_RECEIVERS + 1, 0), dtype=np.int64),
+        'first_seen': np.zeros((SENSING_RECEIVERS + 1, 0), dtype=np.int64),
+        'seen_rows': 0
+    }
+
+
+# Function to list the (counter, node) pairs of one chunk of trace rows, as the counter row of each pair
+# in the count table and its node code, optionally with the chunk row each pair comes from
+def counter_pairs(registry, chunk, with_rows=False):
+    source_codes = intern_nodes(registry, chunk['SOURCE_ID'])
+    receiver_codes = intern_nodes(registry, chunk['RECEIVER_ID'])
+
+    # Flags per node code from the kind table, the trailing entry describes missing node IDs:
+    # sinks and routers are not counted in DAO/DIO sent and received, only sensors in Packet_Received
+    kinds = node_kinds(registry)
+    counted = (kinds == SENSOR) | (kinds == OTHER)
+    sensor_receiver = kinds == SENSOR
+    sensing_kept = np.ones(len(kinds), dtype=bool)
+    sensing_kept[[code for code, label in enumerate(registry['labels']) if label in EXCLUDED_SENSING_NODES]] = False
+
+    # Classify every row once: 0 for DAO, 1 for DIO, -1 for any other or unsuccessful packet
+    successful = category_positions(chunk['PACKET_STATUS'], ['Successful']) == 0
+    packet_type = category_positions(chunk['PACKET_TYPE'], ['Control_Packet', 'Sensing'])
+    control_packet = category_positions(chunk['CONTROL_PACKET_TYPE/APP_NAME'], ['DAO', 'DIO'])
+    control_packet = np.where(successful & (packet_type == 0), control_packet, -1)
+    sensing = successful & (packet_type == 1)
+    kept = sensing & sensing_kept[receiver_codes]
+
+    # (counter, node) pairs of every row, each counter's pairs stay in row order
+    sent = (control_packet >= 0) & counted[source_codes]
+    received = (control_packet >= 0) & counted[receiver_codes]
+    packet_received = sensing & sensor_receiver[receiver_codes]
+    kept_sources = kept & (source_codes >= 0)
+    kept_receivers = kept & (receiver_codes >= 0)
+    counter_ids = np.concatenate([
+        2 * control_packet[sent],
+        2 * control_packet[received] + 1,
+        np.full(np.count_nonzero(packet_received), COUNTER_NAMES.index('Packet_Received')),
+        np.full(np.count_nonzero(kept_sources), SENSING_SOURCES),
+        np.full(np.count_nonzero(kept_receivers), SENSING_RECEIVERS)
+    ])
+    node_ids = np.concatenate([
+        source_codes[sent],
+        receiver_codes[received],
+        receiver_codes[packet_received],
+        source_codes[kept_sources],
+        receiver_codes[kept_receivers]
+    ])
+    if not with_rows:
+        return counter_ids, node_ids
+    row_ids = np.concatenate([np.flatnonzero(mask) for mask in
+                              (sent, received, packet_received, kept_sources, kept_receivers)])
+    return counter_ids, node_ids, row_ids
+
+
+# Function to add the counts of one chunk of trace rows to the state
+def count_chunk(state, chunk):
+    counter_ids, node_ids = counter_pairs(state['registry'], chunk)
+
+    # Grow the tables to the nodes seen so far
+    node_count = len(state['registry']['labels'])
+    new_nodes = node_count - state['counts'].shape[1]
+    counts = np.pad(state['counts'], ((0, 0), (0, new_nodes)))
+    first_seen = np.pad(state['first_seen'], ((0, 0), (0, new_nodes)), constant_values=np.iinfo(np.int64).max)
+
+    # All counters of the chunk in one bincount, plus where each pair first appeared
+    keys = counter_ids * node_count + node_ids
+    counts += np.bincount(keys, minlength=counts.size).reshape(counts.shape)
+    chunk_first_seen = np.full(counts.size, np.iinfo(np.int64).max)
+    np.minimum.at(chunk_first_seen, keys, state['seen_rows'] + np.arange(len(keys)))
+
+    state['counts'] = counts
+    state['first_seen'] = np.minimum(first_seen, chunk_first_seen.reshape(counts.shape))
+    state['seen_rows'] += len(keys)
+
+
+# Function to turn the state into the counters of the rows counted so far
+def finish_count(state):
+    counts, first_seen, registry = state['counts'], state['first_seen'], state['registry']
+    node_names, kinds = registry['labels'], node_kinds(registry)
+
+    # Function to list the nodes of a count table row in order of first appearance
+    def nodes_in_order(row):
+        nodes = np.flatnonzero(counts[row])
+        return nodes[np.argsort(first_seen[row, nodes], kind='stable')]
+
+    trace_counts = {}
+    for row, name in enumerate(COUNTER_NAMES):
+        counter = {}
+        for node in nodes_in_order(row):
+            counter[node_names[node]] = counter.get(node_names[node], 0) + int(counts[row, node])
+        trace_counts[name] = counter_to_series(counter)
+
+    # Sensors present in the Sensing data, in order of first appearance, sources before receivers
+    sensing_nodes = np.concatenate([nodes_in_order(SENSING_SOURCES), nodes_in_order(SENSING_RECEIVERS)])
+    sensing_nodes = sensing_nodes[kinds[sensing_nodes] == SENSOR]
+    trace_counts['Sensing_Nodes'] = list(dict.fromkeys(node_labels(registry, sensing_nodes)))
+
+    return trace_counts
+
+
+# Function to compute the DAO/DIO/Sensing sent and received counters of a trace in a single pass
+def count_trace(file_path, chunksize=TRACE_CHUNKSIZE, use_cache=True):
+    state = start_count()
+    # Rows are filtered and counted in the same vectorized pass, both are timed as counting
+    for chunk in profile_chunks('trace load', read_trace_chunks(file_path, chunksize, use_cache)):
+        with profile_step('count', rows=len(chunk)):
+            count_chunk(state, chunk)
+    with profile_step('count'):
+        return finish_count(state)
+
+
+# Function to find the packet trace of an experiment folder, the plain CSV first, then a compressed one
+def find_trace_file(folder_path):
+    for extension in [''] + list(TRACE_COMPRESSIONS):
+        file_path = os.path.join(folder_path, TRACE_FILE_NAME + extension)
+        if os.path.exists(file_path):
+            return file_path
+    return None
@@ -0,0 +1,148 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+from NodeRegistry import default_registry, node_labels
+from Profiler import profile_step
+from TraceReader import (COUNTER_NAMES, TRACE_CHUNKSIZE, TRACE_COLUMNS, counter_pairs, find_trace_file,
+                         missing_trace_columns, open_trace, trace_header_columns)
+
+# Define the base path where the experiment folders are located
+base_path = "C:\\Users\\jace\\Documents\\Attack_detection_in_IoT\\Test-Samples"
+
+# Length of a window and the time between the starts of two windows, in microseconds of simulation time;
+# a step equal to the window gives tumbling windows, a shorter step sliding ones
+window_us = 1000000
+step_us = None
+
+# Column of 'Packet Trace.csv' the rows are ordered and windowed by
+time_column = 'PHY_LAYER_ARRIVAL_TIME(US)'
+
+# Name of the per-window counts written to every experiment folder, read by Normalize.py when windowed
+WINDOW_COUNTS_FILE_NAME = 'Sensor_Window_Counts.csv'
+
+# Columns describing the window of each row, before the counters
+WINDOW_COLUMNS = ['Window', 'Start_us', 'End_us']
+
+
+# Function to read the (counter, node) pairs of a trace with the time of each, sorted by time once
+def read_timed_pairs(file_path, time_column, registry, chunksize=TRACE_CHUNKSIZE):
+    missing_columns = missing_trace_columns(file_path)
+    if time_column not in trace_header_columns(file_path):
+        missing_columns.append(time_column)
+    if missing_columns:
+        raise ValueError(f"Required columns are missing in {file_path}: {missing_columns}")
+
+    # Only the counters of the count table are windowed, not the Sensing nodes lists
+    parts = []
+    dtypes = {column: 'category' for column in TRACE_COLUMNS}
+    with open_trace(file_path) as source, pd.read_csv(source, encoding='latin1', usecols=TRACE_COLUMNS + [time_column],
+                                                       dtype=dtypes, chunksize=chunksize) as reader:
+        for chunk in reader:
+            counter_ids, node_ids, row_ids = counter_pairs(registry, chunk, with_rows=True)
+            counted = counter_ids < len(COUNTER_NAMES)
+            times = pd.to_numeric(chunk[time_column], errors='coerce').to_numpy(dtype=np.float64)
+            parts.append((counter_ids[counted].astype(np.int8), node_ids[counted].astype(np.int32),
+                          times[row_ids[counted]]))
+
+    counter_ids, node_ids, times = (np.concatenate([part[i] for part in parts]) for i in range(3))
+    # Rows without a time cannot be placed in a window
+    timed = ~np.isnan(times)
+    order = np.argsort(times[timed], kind='stable')
+    return counter_ids[timed][order], node_ids[timed][order], times[timed][order]
+
+
+# Function to sweep the time-sorted pairs once, yielding the counts of every window as it closes;
+# the running counts hold one column per node, whatever the number of windows
+def iter_windows(counter_ids, node_ids, times, node_count, window, step=None):
+    step = window if step is None else step
+    if len(times) == 0:
+        return
+    counts = np.zeros((len(COUNTER_NAMES), node_count), dtype=np.int64)
+    keys = counter_ids.astype(np.int64) * node_count + node_ids
+
+    # Windows start on multiples of the step, from the first one holding the first row to the last one
+    # starting before the last row
+    window_starts = np.arange(np.floor(times[0] / step) * step, times[-1] + step, step)
+    window_starts = window_starts[window_starts + window > times[0]]
+    window_starts = window_starts[:np.searchsorted(window_starts, times[-1], 'right')]
+    heads = np.searchsorted(times, window_starts + window, 'left')
+    tails = np.searchsorted(times, window_starts, 'left')
+
+    # Every pair is added when its window reaches it and removed when the window has passed it
+    head = tail = 0
+    for index, start in enumerate(window_starts):
+        counts += np.bincount(keys[head:heads[index]], minlength=counts.size).reshape(counts.shape)
+        counts -= np.bincount(keys[tail:tails[index]], minlength=counts.size).reshape(counts.shape)
+        head, tail = heads[index], tails[index]
+        yield index, start, start + window, counts
+
+
+# Function to compute the per-sensor counters of every window of a trace, one row per sensor and window
+def count_trace_windows(file_path, window, step=None, registry=None):
+    registry = default_registry if registry is None else registry
+    counter_ids, node_ids, times = read_timed_pairs(file_path, time_column, registry)
+
+    # Counters in the column order of 'Sensor_Message_Counts.csv'
+    feature_names = sorted(COUNTER_NAMES)
+    feature_rows = [COUNTER_NAMES.index(name) for name in feature_names]
+    # Nodes of a window are the ones with DAO or DIO messages in it, as for a whole trace
+    control_rows = [COUNTER_NAMES.index(name) for name in COUNTER_NAMES if name != 'Packet_Received']
+
+    windows, nodes, values = [], [], []
+    with profile_step('window sweep', rows=len(times)):
+        for index, start, end, counts in iter_windows(counter_ids, node_ids, times, len(registry['labels']),
+                                                      window, step):
+            window_nodes = np.flatnonzero(counts[control_rows].any(axis=0))
+            windows.append((index, start, end, len(window_nodes)))
+            nodes.append(window_nodes)
+            values.append(counts[np.ix_(feature_rows, window_nodes)].T)
+
+    # Build the table once, the sensor labels are only looked up here
+    if not windows:
+        return pd.DataFrame(columns=WINDOW_COLUMNS + ['Sensor_ID'] + feature_names)
+    window_counts = pd.DataFrame(np.concatenate(values), columns=feature_names)
+    window_counts.insert(0, 'Sensor_ID', node_labels(registry, np.concatenate(nodes)))
+    row_counts = [window[3] for window in windows]
+    for position, column in enumerate(WINDOW_COLUMNS):
+        window_counts.insert(position, column, np.repeat([window[position] for window in windows], row_counts))
+    return window_counts
+
+
+# Function to count the messages of one experiment folder per window and save its Sensor_Window_Counts.csv
+def process_folder(folder_path, window, step=None):
+    file_path = find_trace_file(folder_path)
+    if file_path is None:
+        return None
+
+    window_counts = count_trace_windows(file_path, window, step)
+    output_file_path = os.path.join(folder_path, WINDOW_COUNTS_FILE_NAME)
+    with profile_step('write window counts', rows=len(window_counts)):
+        window_counts.to_csv(output_file_path, index=False)
+    return output_file_path
+
+
+# Main function to count the messages of every experiment folder per window
+def main(window=None, step=None):
+    window = window_us if window is None else window
+    step = step_us if step is None else step
+    for folder_name in sorted(os.listdir(base_path)):
+        folder_path = os.path.join(base_path, folder_name)
+        if not os.path.isdir(folder_path):
+            continue
+        try:
+            output_file_path = process_folder(folder_path, window, step)
+        except Exception as e:
+            print(f"Error processing {folder_path}: {e}")
+            continue
+        if output_file_path is not None:
+            print(f"Window counts saved to {output_file_path}")
+
+
+# Run the main function, optionally with the window and step in microseconds given on the command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        window_us = float(sys.argv[1])
+    if len(sys.argv) > 2:
+        step_us = float(sys.argv[2])
+    main()
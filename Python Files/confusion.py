@@ -1,59 +1,136 @@
-import pandas as pd
-from sklearn.metrics import confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
-
-# Function to calculate confusion matrix and metrics for a model
-def generate_metrics_and_plots(predicted_file, actual_file, classifier_name, cmap):
-    # Verify file existence
-    if not os.path.exists(predicted_file):
-        print(f"Error: Predicted file {predicted_file} not found.")
-        return
-    if not os.path.exists(actual_file):
-        print(f"Error: Actual file {actual_file} not found.")
-        return
-
-    # Load data from Excel files
+from DatasetIO import read_dataset, resolve_dataset
+from FeatureStore import load_label_vector
+from Metrics import evaluate_classifiers
+from Profiler import profile_step
+
+# Save the plots without a display or plt.show(), so batch jobs never block on a window
+headless = False
+
+# File paths for predicted labels for all models, without the dataset format extension
+models = {
+    "SVM": ("SupportVectorMachine", sns.color_palette("Blues")),
+    "Naive Bayes": ("NaiveBayes", sns.color_palette("Greens")),
+    "Logistic Regression": ("LogisticRegression", sns.color_palette("Oranges")),
+    "KNN": ("K-NearestNeighbour", sns.color_palette("Purples"))
+}
+
+# Path to the actual labels
+actual_file = 'C:\\Users\\mihit\\Desktop\\Attack_detection_in_IoT\\Python Files\\test_data_manual'
+
+# Column of the actual file to break the metrics down by, skipped when the file does not have it; Normalize.py
+# writes the name of each row's run subfolder in its 'Sensor' column
+group_column = 'Sensor'
+
+# Name the groups are reported under, the groups of the 'Sensor' column are runs, not sensors
+group_label = 'Run'
+
+# Function to map the 'Label' column of a dataset file, None if it cannot be used
+def load_labels(file_path, description, classifier_name):
+    # Verify file existence, in whichever dataset format the file was saved
+    resolved_path = resolve_dataset(file_path)
+    if resolved_path is None:
+        print(f"Error: {description} file {file_path} not found.")
+        return None
+
+    # Map the labels from the labels file written next to the dataset, built on first use
     try:
-        predicted_df = pd.read_excel(predicted_file)
-        actual_df = pd.read_excel(actual_file)
+        labels = load_label_vector(file_path)
     except Exception as e:
         print(f"Error loading files for {classifier_name}: {e}")
-        return
+        return None
 
     # Ensure 'Label' column exists
-    if 'Label' not in predicted_df.columns or 'Label' not in actual_df.columns:
-        print(f"Error: 'Label' column missing in predicted or actual file for {classifier_name}.")
-        return
+    if labels is None:
+        print(f"Error: 'Label' column missing in {description.lower()} file for {classifier_name}.")
+        return None
+    return labels
 
-    # Extract labels
-    predicted_labels = predicted_df['Label']
-    actual_labels = actual_df['Label']
 
-    # Ensure data alignment
-    if len(predicted_labels) != len(actual_labels):
-        print(f"Error: Row count mismatch between predicted and actual labels for {classifier_name}.")
-        return
-
-    # Calculate confusion matrix and metrics
+# Function to calculate confusion matrix and metrics for a model
+def generate_metrics_and_plots(predicted_file, actual_file, classifier_name, cmap):
+    evaluate_models({classifier_name: (predicted_file, cmap)}, actual_file)
+
+
+# Function to evaluate all models against the actual labels in one pass and plot each of them
+def evaluate_models(models, actual_file, group_column=None):
+    if headless:
+        plt.switch_backend('Agg')
+
+    # Map the actual labels once for all models
+    actual_labels = load_labels(actual_file, 'Actual', ', '.join(models))
+    if actual_labels is None:
+        return None
+
+    predicted_labels = {}
+    for classifier_name, (predicted_file, cmap) in models.items():
+        predicted = load_labels(predicted_file, 'Predicted', classifier_name)
+        if predicted is None:
+            continue
+
+        # Ensure data alignment
+        if len(predicted) != len(actual_labels):
+            print(f"Error: Row count mismatch between predicted and actual labels for {classifier_name}.")
+            continue
+        predicted_labels[classifier_name] = predicted
+
+    if not predicted_labels:
+        return None
+
+    # Break the metrics down by a column of the actual file, such as the run of each row, when it has one
+    groups = None
+    if group_column is not None:
+        actual_df = read_dataset(resolve_dataset(actual_file))
+        if group_column in actual_df.columns:
+            groups = actual_df[group_column].astype(str).to_numpy()
+
+    # Calculate the confusion matrices and metrics of all models together
     try:
-        cm = confusion_matrix(actual_labels, predicted_labels)
-
+        with profile_step('metrics', rows=len(actual_labels) * len(predicted_labels)):
+            summary, breakdown, confusion, classes = evaluate_classifiers(actual_labels, predicted_labels, groups)
+    except Exception as e:
+        print(f"Error in calculating metrics for {', '.join(predicted_labels)}: {e}")
+        return None
+
+    print(summary.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    output_file_summary = os.path.join(os.getcwd(), 'Metrics_Summary.csv')
+    summary.to_csv(output_file_summary, index=False)
+    print(f"Metrics summary saved as {output_file_summary}")
+    if breakdown is not None:
+        breakdown = breakdown.rename(columns={'Group': group_label})
+        output_file_breakdown = os.path.join(os.getcwd(), f'Metrics_By_{group_label}.csv')
+        breakdown.to_csv(output_file_breakdown, index=False)
+        print(f"Metrics by {group_label.lower()} saved as {output_file_breakdown}")
+
+    for index, classifier_name in enumerate(summary['Classifier']):
+        metrics = summary.iloc[index]
+        with profile_step(f'plot {classifier_name}'):
+            generate_plots(confusion[classifier_name], classes[classifier_name], metrics, classifier_name, models[classifier_name][1])
+    return summary
+
+
+# Function to plot the confusion matrix and metrics table of a model
+def generate_plots(cm, classes, metrics, classifier_name, cmap):
+    accuracy, precision, recall, f1 = metrics['Accuracy'], metrics['Precision'], metrics['Recall'], metrics['F1 Score']
+    if cm.shape == (2, 2):
         # Flatten and rearrange the confusion matrix for old layout format
         cm_flattened = cm.ravel()
         PP, PN, NP, NN = cm_flattened[3], cm_flattened[2], cm_flattened[1], cm_flattened[0]
         cm_rearranged = [[PP, PN],  # First row: Predicted Positive
                          [NP, NN]]  # Second row: Predicted Negative
-
-        # Calculate additional metrics
-        accuracy = accuracy_score(actual_labels, predicted_labels)
-        precision = precision_score(actual_labels, predicted_labels)
-        recall = recall_score(actual_labels, predicted_labels)
-        f1 = f1_score(actual_labels, predicted_labels)
-    except Exception as e:
-        print(f"Error in calculating metrics for {classifier_name}: {e}")
-        return
+        tick_labels = ['Positive', 'Negative']
+        count_rows = [["True Positives (PP)", f"{PP}"],
+                      ["False Positives (PN)", f"{PN}"],
+                      ["False Negatives (NP)", f"{NP}"],
+                      ["True Negatives (NN)", f"{NN}"]]
+    else:
+        # More than two classes: predicted classes as rows, actual classes as columns, macro-averaged metrics
+        cm_rearranged = cm.T
+        tick_labels = [str(label) for label in classes]
+        count_rows = [["Correct", f"{cm.trace()}"],
+                      ["Incorrect", f"{cm.sum() - cm.trace()}"]]
 
     # Part 1: Generate the Confusion Matrix Image
     try:
@@ -67,15 +144,17 @@ def generate_metrics_and_plots(predicted_file, actual_file, classifier_name, cma
         # Setting labels for axes and title
         ax_cm.set_xlabel('Actual Values', fontsize=16, weight='bold')
         ax_cm.set_ylabel('Predicted Values', fontsize=16, weight='bold')
-        ax_cm.set_xticklabels(['Positive', 'Negative'], fontsize=12, weight='bold')
-        ax_cm.set_yticklabels(['Positive', 'Negative'], fontsize=12, weight='bold')
+        ax_cm.set_xticklabels(tick_labels, fontsize=12, weight='bold')
+        ax_cm.set_yticklabels(tick_labels, fontsize=12, weight='bold')
         plt.title(f'Confusion Matrix : {classifier_name}', fontsize=18, weight='bold', pad=10)
 
         # Adjust layout and save figure
         plt.tight_layout()
         output_file_cm = os.path.join(os.getcwd(), f'Confusion_Matrix_{classifier_name}_CustomPalette.png')
         plt.savefig(output_file_cm, bbox_inches='tight', pad_inches=0.2, dpi=150)
-        plt.show()
+        if not headless:
+            plt.show()
+        plt.close(fig_cm)
     except Exception as e:
         print(f"Error in generating confusion matrix for {classifier_name}: {e}")
         return
@@ -85,11 +164,7 @@ def generate_metrics_and_plots(predicted_file, actual_file, classifier_name, cma
         fig_table, ax_table = plt.subplots(figsize=(6, 4), dpi=100)
 
         # Table data for metrics
-        table_data = [
-            ["True Positives (PP)", f"{PP}"],
-            ["False Positives (PN)", f"{PN}"],
-            ["False Negatives (NP)", f"{NP}"],
-            ["True Negatives (NN)", f"{NN}"],
+        table_data = count_rows + [
             ["Accuracy", f"{accuracy:.4f}"],
             ["Precision", f"{precision:.4f}"],
             ["Recall", f"{recall:.4f}"],
@@ -110,7 +185,9 @@ def generate_metrics_and_plots(predicted_file, actual_file, classifier_name, cma
         ax_table.axis('off')
         output_file_table = os.path.join(os.getcwd(), f'Metrics_Table_{classifier_name}_CustomPalette.png')
         plt.savefig(output_file_table, bbox_inches='tight', pad_inches=0.2, dpi=150)
-        plt.show()
+        if not headless:
+            plt.show()
+        plt.close(fig_table)
 
         print(f"Confusion matrix plot saved as {output_file_cm}")
         print(f"Metrics table saved as {output_file_table}")
@@ -120,21 +197,9 @@ def generate_metrics_and_plots(predicted_file, actual_file, classifier_name, cma
 
 # Main function to generate confusion matrix and metrics for all models
 def main():
-    # File paths for predicted labels for all models
-    models = {
-        "SVM": ("SupportVectorMachine.xlsx", sns.color_palette("Blues")),
-        "Naive Bayes": ("NaiveBayes.xlsx", sns.color_palette("Greens")),
-        "Logistic Regression": ("LogisticRegression.xlsx", sns.color_palette("Oranges")),
-        "KNN": ("K-NearestNeighbour.xlsx", sns.color_palette("Purples"))
-    }
-
-    # Path to the actual labels
-    actual_file = 'C:\\Users\\mihit\\Desktop\\Attack_detection_in_IoT\\Python Files\\test_data_manual.xlsx'
-
-    # Loop through all models
-    for model_name, (predicted_file, cmap) in models.items():
-        print(f"Processing metrics for {model_name}...")
-        generate_metrics_and_plots(predicted_file, actual_file, model_name, cmap)
+    # Evaluate all models against the actual labels in one pass
+    print(f"Processing metrics for {', '.join(models)}...")
+    evaluate_models(models, actual_file, group_column)
 
 
 # Run the main function